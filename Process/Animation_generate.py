@@ -10,6 +10,8 @@ from matplotlib.animation import FuncAnimation
 from tqdm import tqdm
 import pandas as pd  # 用于读取 Excel 文件
 
+import positions
+
 # -------------------- 文件路径配置 --------------------
 INVENTORY_PATH = "./inventory.yaml"
 POSITIONS_PATH = "./positions.yml"
@@ -27,22 +29,10 @@ def get_ceiling_devices(inventory_path):
 
 
 def get_ceiling_antenna_positions(positions_path, ceiling_tiles):
-    with open(positions_path, 'r') as f:
-        positions = yaml.safe_load(f)
-    antenna_positions = []
-    for tile in positions['antennes']:
-        if tile['tile'] in ceiling_tiles:
-            for ch in tile['channels']:
-                if ch['ch'] == 0:
-                    # 这里只读取天线的位置信息，固定假设天线朝向为 (0, 0, -1)
-                    pos = {
-                        'tile': tile['tile'],
-                        'x': ch['x'],
-                        'y': ch['y'],
-                        'z': ch['z']
-                    }
-                    antenna_positions.append(pos)
-    return antenna_positions
+    # 只读取天线（ch 0）的位置信息，固定假设天线朝向为 (0, 0, -1)；位置来自 positions.py 的二进制缓存
+    table = positions.select(ceiling_tiles, ch=0, path=positions_path)
+    return [{'tile': str(row['tile']), 'x': row['xyz'][0], 'y': row['xyz'][1], 'z': row['xyz'][2]}
+            for row in table]
 
 
 # -------------------- 数据加载 --------------------
@@ -0,0 +1,169 @@
+"""
+批量波束赋形权重：对成千上万个信道快照同时计算每个快照的权重，全部沿快照维向量化。
+
+信道 H 的形状为 (S, L, K)：S 个快照、L 根天线（tile）、K 个目标点，与 Htrain.npy / Hval.npy /
+Htest.npy 以及 build_dataset.py 生成的 new_H*.npy 相同。目标点 k 的接收信号 y_k = Σ_l H[s, l, k] · w[s, l]，
+权重满足总功率约束 ||w|| = 1（等增益为每根天线 1/√L）。缺失的信道（NaN）按 0 处理，对应天线不分配功率。
+
+  - mrt:     最大比传输，对各目标点归一化 MRT 方向求和（K = 1 时即普通 MRT）；
+  - egc:     等增益（只调相位），相位取自 MRT 方向；
+  - max_min: 多目标点最大化最小接收功率，迭代：按当前相位对齐的加权 MRT，再提高弱目标点的权重；
+  - static:  由训练集得到一个固定权重（平均接收功率最大的主特征向量），用于在保留集上对比。
+
+    python bf_optimizer.py --train Htrain.npy --eval Hval.npy Htest.npy --benchmark 20000
+"""
+import time
+import argparse
+
+import numpy as np
+
+MAX_MIN_ITERATIONS = 50
+MAX_MIN_STEP = 0.5              # 权重更新的指数：μ_k ← μ_k · (p_min / p_k)^step
+EPS = 1e-30
+
+
+def clean_channels(H):
+    """(S, L, K) complex128，NaN 置 0；二维输入 (S, L) 视为 K = 1"""
+    H = np.asarray(H)
+    if H.ndim == 2:
+        H = H[..., None]
+    return np.nan_to_num(H.astype(np.complex128, copy=False))
+
+
+def normalize(w):
+    """按快照归一化为单位范数 (S, L)"""
+    return w / np.maximum(np.linalg.norm(w, axis=-1, keepdims=True), EPS)
+
+
+def received_power(H, w):
+    """各快照各目标点的接收功率 |Σ_l H[s,l,k] w[s,l]|²，形状 (S, K)；w 可为 (L,) 的固定权重"""
+    H = clean_channels(H)
+    y = np.einsum("slk,l->sk", H, w) if np.ndim(w) == 1 else np.einsum("slk,sl->sk", H, w)
+    return np.abs(y) ** 2
+
+
+def mrt(H):
+    """最大比传输：w ∝ Σ_k conj(h_k) / ||h_k||"""
+    H = clean_channels(H)
+    directions = np.conj(H) / np.maximum(np.linalg.norm(H, axis=1, keepdims=True), EPS)
+    return normalize(directions.sum(axis=-1))
+
+
+def egc(H):
+    """等增益：|w_l| = 1/√L（缺失天线为 0），相位与 MRT 相同"""
+    H = clean_channels(H)
+    phase = np.exp(1j * np.angle(mrt(H)))
+    active = np.any(H != 0, axis=-1)
+    return phase * active / np.sqrt(np.maximum(active.sum(axis=-1, keepdims=True), 1))
+
+
+def max_min(H, iterations=MAX_MIN_ITERATIONS, step=MAX_MIN_STEP):
+    """
+    最大化各快照最小的目标点接收功率。每次迭代
+        w ← normalize(Σ_k μ_k · conj(h_k) · exp(−j∠(h_kᵀ w)) / ||h_k||)     （相位对齐的加权 MRT）
+        μ_k ← μ_k · (min_j p_j / p_k)^step，再归一化                        （提高弱目标点的权重）
+    从 MRT 出发，保留每个快照最小功率最大的迭代结果，因此不会比 MRT 差。
+    """
+    H = clean_channels(H)
+    norms = np.maximum(np.linalg.norm(H, axis=1), EPS)              # (S, K)
+    directions = np.conj(H) / norms[:, None, :]
+    n_snapshots, _, n_targets = H.shape
+    mu = np.full((n_snapshots, n_targets), 1.0 / n_targets)
+    w = mrt(H)
+    best_w = w.copy()
+    best_min = np.zeros(n_snapshots)
+    for _ in range(iterations):
+        y = np.einsum("slk,sl->sk", H, w)
+        power = np.abs(y) ** 2
+        p_min = power.min(axis=-1)
+        better = p_min > best_min
+        best_w[better] = w[better]
+        best_min[better] = p_min[better]
+        mu *= (p_min[:, None] / np.maximum(power, EPS)) ** step
+        mu /= mu.sum(axis=-1, keepdims=True)
+        aligned = directions * np.exp(1j * np.angle(y))[:, None, :]
+        # 相位对齐后 conj(h_k)·e^{j∠y_k} 与 w 同向时 y_k 为正实数，加权和即各目标点的折中方向
+        w = normalize(np.einsum("slk,sk->sl", aligned, mu))
+    # 最后一次更新得到的 w 还没有评估过
+    p_min = (np.abs(np.einsum("slk,sl->sk", H, w)) ** 2).min(axis=-1)
+    better = p_min > best_min
+    best_w[better] = w[better]
+    return best_w
+
+
+def static(H_train):
+    """固定权重：训练集信道协方差 Σ_{s,k} conj(h) hᵀ 的主特征向量（平均接收功率最大）"""
+    H = clean_channels(H_train)
+    covariance = np.einsum("slk,smk->lm", np.conj(H), H)
+    _, vectors = np.linalg.eigh(covariance)
+    return vectors[:, -1]
+
+
+METHODS = {"mrt": mrt, "egc": egc, "max_min": max_min}
+
+
+def summarize(power):
+    """接收功率 (S, K) 的摘要：平均总功率、平均最小功率、最小功率的 5% 分位数（dB）"""
+    to_db = lambda p: 10 * np.log10(np.maximum(p, EPS))
+    p_min = power.min(axis=-1)
+    return {
+        "mean_db": to_db(power.mean()),
+        "min_mean_db": to_db(p_min.mean()),
+        "min_p5_db": to_db(np.percentile(p_min, 5)),
+    }
+
+
+def evaluate(H, static_w=None, methods=None):
+    """在信道集 H 上计算各方法（默认 METHODS）的接收功率摘要，返回 {方法: 摘要}"""
+    H = clean_channels(H)
+    methods = METHODS if methods is None else methods
+    results = {name: summarize(received_power(H, method(H))) for name, method in methods.items()}
+    if static_w is not None:
+        results["static"] = summarize(received_power(H, static_w))
+    return results
+
+
+def benchmark(H, n_snapshots, repeat=3, methods=None):
+    """把 H 重复到 n_snapshots 个快照，测量各方法（默认 METHODS）每秒处理的快照数"""
+    H = clean_channels(H)
+    H = H[np.arange(n_snapshots) % len(H)]
+    rates = {}
+    for name, method in (METHODS if methods is None else methods).items():
+        best = np.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            method(H)
+            best = min(best, time.perf_counter() - start)
+        rates[name] = n_snapshots / best
+    return rates
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="批量计算波束赋形权重并在保留集上比较接收功率")
+    parser.add_argument("--train", default="Htrain.npy", help="训练集（用于 static 固定权重）")
+    parser.add_argument("--eval", nargs="+", default=["Hval.npy", "Htest.npy"], help="评估集")
+    parser.add_argument("--iterations", type=int, default=MAX_MIN_ITERATIONS, help="max_min 的迭代次数")
+    parser.add_argument("--benchmark", type=int, default=0, help="基准测试的快照数（0 为不测试）")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    # 局部副本，不修改模块级的 METHODS
+    methods = dict(METHODS, max_min=lambda H: max_min(H, iterations=args.iterations))
+    static_w = static(np.load(args.train)) if args.train else None
+
+    for path in args.eval:
+        H = np.load(path)
+        print(f"{path}: {H.shape[0]} 个快照，{H.shape[1]} 根天线，{H.shape[2] if H.ndim == 3 else 1} 个目标点")
+        for name, s in evaluate(H, static_w, methods).items():
+            print(f"  {name:8s} 平均功率 {s['mean_db']:7.2f} dB  平均最小功率 {s['min_mean_db']:7.2f} dB  "
+                  f"最小功率 5% 分位 {s['min_p5_db']:7.2f} dB")
+
+    if args.benchmark:
+        for name, rate in benchmark(np.load(args.train), args.benchmark, methods=methods).items():
+            print(f"基准 {name:8s} {rate:12.0f} 快照/s")
+
+
+if __name__ == "__main__":
+    main()
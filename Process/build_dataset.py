@@ -0,0 +1,182 @@
+"""
+由每次采集的结果摘要（extract_data.py 生成的列式结果库 Data/results.npz）构建信道数据集：
+
+  1. 把所有记录按块写入内存映射的复数张量 H[tile, snapshot, round]
+     （值为 振幅 × exp(1j·circ_mean)，缺失为 NaN），不在内存中生成完整数组；
+  2. 用向量化的索引映射把快照两两配对（默认与 processdata.ipynb 中 combine_columns 相同：
+     第 i 列与倒数第 i+1 列），得到 (pairs, tiles, 2) 的样本；
+  3. 按固定或随机（可设种子）顺序划分 train/val/test，分块写出各个划分文件。
+
+原始采集先经过 client/process_data.py 得到摘要记录，再由 extract_data.py 汇总，新的测量加入后重新运行即可。
+"""
+import os
+import argparse
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+import extract_data
+
+DEFAULT_STORE = os.path.join("Data", extract_data.STORE_NAME)
+TENSOR_NAME = "channel_tensor.npy"
+CHUNK_ROWS = 65536          # 每次写入内存映射文件的记录/样本数
+
+
+def snapshot_coordinates(store, tiles, rounds):
+    """
+    每条记录在张量中的坐标 (tile 下标, snapshot 下标, round 下标)，以及选中的记录掩码。
+    结果库已按 (tile, round, timestamp) 排序，同一 (tile, round) 的记录连续，
+    快照下标即组内序号。
+    """
+    sel = np.isin(store["tile"], tiles) & np.isin(store["round"], rounds)
+    tile_col = store["tile"][sel]
+    round_col = store["round"][sel]
+
+    sorter = np.argsort(tiles)
+    tile_idx = sorter[np.searchsorted(tiles, tile_col, sorter=sorter)]
+    round_idx = np.searchsorted(rounds, round_col)
+
+    group = tile_idx.astype(np.int64) * len(rounds) + round_idx
+    new_group = np.r_[True, group[1:] != group[:-1]]
+    group_start = np.flatnonzero(new_group)[np.cumsum(new_group) - 1]
+    snap_idx = np.arange(len(group)) - group_start
+    return tile_idx, snap_idx, round_idx, sel
+
+
+def build_tensor(store, path, rounds=(1, 2), amplitude="avg_ampl_ch0", tiles=None):
+    """
+    把结果库写成内存映射的复数张量 (tiles, snapshots, rounds)，返回只读的映射。
+    amplitude 为 None 时只保留相位（单位幅度，与 round*_phase_data.npy 相同）。
+    同时返回每个 (tile, round) 的有效快照数 counts。
+    """
+    tiles = store["tiles"] if tiles is None else np.asarray(tiles, dtype=store["tiles"].dtype)
+    rounds = np.sort(np.asarray(rounds, dtype=store["round"].dtype))
+    tile_idx, snap_idx, round_idx, sel = snapshot_coordinates(store, tiles, rounds)
+
+    counts = np.zeros((len(tiles), len(rounds)), dtype=np.int64)
+    np.add.at(counts, (tile_idx, round_idx), 1)
+    n_snapshots = int(counts.max()) if counts.size else 0
+
+    tensor = open_memmap(path, mode="w+", dtype=np.complex128, shape=(len(tiles), n_snapshots, len(rounds)))
+    for t in range(len(tiles)):
+        tensor[t] = np.nan
+
+    rows = np.flatnonzero(sel)
+    for start in range(0, len(rows), CHUNK_ROWS):
+        part = slice(start, start + CHUNK_ROWS)
+        r = rows[part]
+        values = np.exp(1j * store["circ_mean"][r])
+        if amplitude is not None:
+            values *= store[amplitude][r]
+        tensor[tile_idx[part], snap_idx[part], round_idx[part]] = values
+    tensor.flush()
+    del tensor
+    return np.load(path, mmap_mode="r"), counts
+
+
+def pair_mirror(n_snapshots, round_idx=0):
+    """第 i 个快照与倒数第 i+1 个快照配对（快照数为奇数时舍去最后一个）"""
+    n = n_snapshots // 2 * 2
+    i = np.arange(n // 2)
+    snaps = np.stack((i, n - 1 - i), axis=-1)
+    return np.stack((snaps, np.full_like(snaps, round_idx)), axis=-1)
+
+
+def pair_adjacent(n_snapshots, round_idx=0):
+    """相邻快照配对：(0, 1), (2, 3), ..."""
+    snaps = np.arange(n_snapshots // 2 * 2).reshape(-1, 2)
+    return np.stack((snaps, np.full_like(snaps, round_idx)), axis=-1)
+
+
+def pair_rounds(n_snapshots, round_idx=0, n_rounds=2):
+    """同一快照相邻两轮的测量配对：(snapshot, round_idx) 与 (snapshot, round_idx + 1)；n_rounds 为张量的轮次数"""
+    if n_rounds < 2 or not 0 <= round_idx < n_rounds - 1:
+        raise ValueError(f"rounds 配对需要第 {round_idx} 轮之后还有一轮，张量只有 {n_rounds} 轮")
+    snaps = np.repeat(np.arange(n_snapshots)[:, None], 2, axis=1)
+    return np.stack((snaps, np.broadcast_to([round_idx, round_idx + 1], snaps.shape)), axis=-1)
+
+
+# 配对规则：返回 (pairs, 2, 2) 的索引映射，最后一维为张量中的 (snapshot, round) 坐标
+PAIRING_RULES = {
+    "mirror": pair_mirror,
+    "adjacent": pair_adjacent,
+    "rounds": pair_rounds,
+}
+
+
+def split_indices(n_samples, sizes, seed=None):
+    """
+    划分样本下标。seed 为 None 时按原顺序连续划分（与 notebook 中 150/50/52 的切片一致），
+    否则用该种子做一次确定性的随机排列。sizes 中最后一个为 -1 时表示剩余全部样本。
+    """
+    order = np.arange(n_samples) if seed is None else np.random.default_rng(seed).permutation(n_samples)
+    sizes = list(sizes)
+    if sizes and sizes[-1] < 0:
+        sizes[-1] = n_samples - sum(sizes[:-1])
+    if sum(sizes) > n_samples:
+        raise ValueError(f"划分大小之和 {sum(sizes)} 超过样本数 {n_samples}")
+    bounds = np.cumsum([0] + sizes)
+    return [order[bounds[k]:bounds[k + 1]] for k in range(len(sizes))]
+
+
+def write_samples(tensor, pairs, sample_idx, path):
+    """按样本块从张量中取出配对后的数据写入 (n, tiles, 2) 的 .npy 文件，每次只读取一块"""
+    out = open_memmap(path, mode="w+", dtype=tensor.dtype, shape=(len(sample_idx), tensor.shape[0], 2))
+    step = max(1, CHUNK_ROWS // max(1, tensor.shape[0]))
+    for start in range(0, len(sample_idx), step):
+        coords = pairs[sample_idx[start:start + step]]            # (chunk, 2, 2)
+        block = tensor[:, coords[..., 0], coords[..., 1]]         # (tiles, chunk, 2)
+        out[start:start + len(coords)] = block.transpose(1, 0, 2)
+    out.flush()
+    return out.shape
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="由结果库构建信道张量与 train/val/test 数据集")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="extract_data.py 生成的列式结果库")
+    parser.add_argument("--out", default=".", help="输出目录")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[1, 2], help="写入张量的轮次")
+    parser.add_argument("--pair-round", type=int, default=1, help="mirror/adjacent 配对使用的轮次；rounds 配对时与下一轮配对")
+    parser.add_argument("--pairing", choices=sorted(PAIRING_RULES), default="mirror", help="快照配对规则")
+    parser.add_argument("--amplitude", default="avg_ampl_ch0",
+                        help="作为幅度的字段（none 表示只用相位）")
+    parser.add_argument("--split", type=int, nargs="+", default=[150, 50, 52],
+                        help="train/val/test 样本数，最后一个为 -1 表示剩余全部")
+    parser.add_argument("--seed", type=int, default=None, help="随机划分的种子（默认按顺序划分）")
+    parser.add_argument("--prefix", default="new_", help="划分文件名前缀，如 new_Htrain.npy")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if not os.path.exists(args.store):
+        print(f"未找到结果库 {args.store}，先由 Data 目录生成。")
+        store = extract_data.build_store(os.path.dirname(args.store) or ".")
+        extract_data.save_store(store, args.store)
+    else:
+        store = extract_data.load_store(args.store)
+
+    amplitude = None if args.amplitude.lower() == "none" else args.amplitude
+    rounds = sorted(args.rounds)
+    os.makedirs(args.out, exist_ok=True)
+    tensor, counts = build_tensor(store, os.path.join(args.out, TENSOR_NAME), rounds, amplitude)
+    print(f"信道张量 (tiles, snapshots, rounds) = {tensor.shape}")
+
+    # 只使用所有设备都有数据的快照，配对后的样本中不含 NaN
+    r = rounds.index(args.pair_round)
+    if args.pairing == "rounds":
+        pairs = pair_rounds(int(counts[:, r:r + 2].min()), r, tensor.shape[2])
+    else:
+        pairs = PAIRING_RULES[args.pairing](int(counts[:, r].min()), r)
+
+    all_idx = np.arange(len(pairs))
+    shape = write_samples(tensor, pairs, all_idx, os.path.join(args.out, "combined_phase_data.npy"))
+    print(f"组合后数据的形状: {shape}")
+
+    for name, idx in zip(("Htrain", "Hval", "Htest"), split_indices(len(pairs), args.split, args.seed)):
+        out_path = os.path.join(args.out, f"{args.prefix}{name}.npy")
+        print(f"{out_path}: {write_samples(tensor, pairs, idx, out_path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+离线互易校准求解：由已保存的 pilot / loopback 摘要（usrp-cal-bf.py 的采集）一次性计算所有 tile 的相位校正。
+
+usrp-cal-bf.py 在 tile 上用一次 pilot 与一次 loopback 测量得到
+    phase_corr = phi_LB + phi_P + deg2rad(phi_cable)
+其中 phi_P、phi_LB 是相位差的线性均值（记录中的 linear_mean），phi_cable 来自 config-phase-offsets.yml。
+这里对每个 (tile, experiment, meas_id) 配对 pilot 与 loopback，得到每次测量的校正值，
+再对每个 tile 做稳健的加权循环均值（Tukey 双权重迭代），并给出循环标准差、标准误差与有效样本数。
+全部按 tile 分组向量化计算，几十个 tile、上千次测量只需几毫秒。
+
+结果写成 YAML 校正表，tile 端在 cal-settings.yml 中设置 PHASE_CORRECTION_TABLE 后可直接加载。
+"""
+import os
+import json
+import argparse
+
+import numpy as np
+import yaml
+
+from results_db import load_summaries
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OFFSETS = os.path.join(SCRIPT_DIR, "..", "client", "config-phase-offsets.yml")
+DEFAULT_OUTPUT = os.path.join(SCRIPT_DIR, "..", "client", "config-phase-corrections.yml")
+
+ROBUST_ITERATIONS = 3
+TUKEY_C = 4.685             # Tukey 双权重常数（残差以 1.4826·MAD 归一化）
+
+SOLUTION_DTYPE = np.dtype([
+    ("tile", "U3"),
+    ("correction", "f8"),   # rad，(-pi, pi]
+    ("std", "f8"),          # 循环标准差，rad
+    ("sem", "f8"),          # 均值的标准误差，rad
+    ("n", "i4"),            # 参与的测量次数
+    ("n_eff", "f8"),        # 稳健权重下的有效样本数
+])
+
+
+def load_cable_offsets(path):
+    """config-phase-offsets.yml：tile → 线缆相位（deg）"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return yaml.safe_load(f) or {}
+
+
+def _latest_by_key(keys):
+    """每个键只保留最后一条记录（重复上传时以最新为准），返回 (唯一键, 行号)"""
+    unique, idx = np.unique(keys[::-1], return_index=True)
+    return unique, len(keys) - 1 - idx
+
+
+def pair_captures(table):
+    """
+    按 (tile, experiment, meas_id) 配对 pilot 与 loopback 记录。
+    返回 (tile, pilot 行号, loopback 行号)，均为数组。
+    """
+    keys = np.char.add(np.char.add(np.char.add(table["tile"], "_"), table["experiment"]),
+                       np.char.add("_", table["meas_id"].astype("U10")))
+    pilot = np.flatnonzero(table["kind"] == "pilot")
+    loopback = np.flatnonzero(table["kind"] == "loopback")
+    p_keys, p_rows = _latest_by_key(keys[pilot])
+    lb_keys, lb_rows = _latest_by_key(keys[loopback])
+    _, p_idx, lb_idx = np.intersect1d(p_keys, lb_keys, assume_unique=True, return_indices=True)
+    p_rows, lb_rows = pilot[p_rows[p_idx]], loopback[lb_rows[lb_idx]]
+    return table["tile"][p_rows], p_rows, lb_rows
+
+
+def group_median(values, groups, n_groups):
+    """按组求中位数（向量化：按 (组, 值) 排序后取每组中间的元素）"""
+    order = np.lexsort((values, groups))
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    lo = starts + (counts - 1) // 2
+    hi = starts + counts // 2
+    sorted_values = values[order]
+    median = np.full(n_groups, np.nan)
+    has = counts > 0
+    median[has] = 0.5 * (sorted_values[lo[has]] + sorted_values[hi[has]])
+    return median
+
+
+def solve(tiles, corrections, weights=None, iterations=ROBUST_ITERATIONS):
+    """
+    每个 tile 的稳健循环均值：先求加权循环均值，再按残差（以 1.4826·MAD 归一化）做 Tukey 双权重，
+    迭代 iterations 次。返回 SOLUTION_DTYPE 数组（按 tile 排序）。
+    """
+    unique_tiles, group = np.unique(tiles, return_inverse=True)
+    n_groups = len(unique_tiles)
+    corrections = np.asarray(corrections, dtype=np.float64)
+    base = np.ones_like(corrections) if weights is None else np.asarray(weights, dtype=np.float64)
+    z = np.exp(1j * corrections)
+
+    w = base.copy()
+    for _ in range(iterations + 1):
+        mean = np.angle(np.bincount(group, w * z.real, n_groups) + 1j * np.bincount(group, w * z.imag, n_groups))
+        residual = np.angle(z * np.exp(-1j * mean[group]))
+        scale = 1.4826 * group_median(np.abs(residual), group, n_groups)
+        u = residual / np.maximum(TUKEY_C * scale[group], 1e-12)
+        w = base * np.where(np.abs(u) < 1, (1 - u * u) ** 2, 0.0)
+
+    w_sum = np.bincount(group, w, n_groups)
+    r = np.abs(np.bincount(group, w * np.cos(residual), n_groups) + 1j * np.bincount(group, w * np.sin(residual), n_groups))
+    r = np.clip(r / np.maximum(w_sum, 1e-300), 1e-12, 1.0)
+    std = np.sqrt(-2 * np.log(r))
+    n_eff = w_sum ** 2 / np.maximum(np.bincount(group, w * w, n_groups), 1e-300)
+
+    solution = np.zeros(n_groups, dtype=SOLUTION_DTYPE)
+    solution["tile"] = unique_tiles
+    solution["correction"] = mean
+    solution["std"] = std
+    solution["sem"] = std / np.sqrt(np.maximum(n_eff, 1))
+    solution["n"] = np.bincount(group, minlength=n_groups)
+    solution["n_eff"] = n_eff
+    return solution
+
+
+def compute_corrections(table, cable_offsets, weight_by_std=False):
+    """由摘要表得到每次测量的校正值 phi_LB + phi_P + deg2rad(phi_cable) 及其权重"""
+    tiles, p_rows, lb_rows = pair_captures(table)
+    cable = np.array([float(cable_offsets.get(tile, 0.0)) for tile in tiles])
+    corrections = table["linear_mean"][lb_rows] + table["linear_mean"][p_rows] + np.deg2rad(cable)
+    weights = None
+    if weight_by_std:
+        # 按两次采集相位差的离散程度加权：w = 1 / (σ_P² + σ_LB²)
+        var = table["circ_std"][p_rows] ** 2 + table["circ_std"][lb_rows] ** 2
+        weights = np.where(np.isfinite(var) & (var > 0), 1.0 / var, 0.0)
+    missing = sorted(set(tiles.tolist()) - set(cable_offsets))
+    if missing:
+        print(f"以下 tile 没有线缆相位，按 0 处理: {', '.join(missing)}")
+    return tiles, corrections, weights
+
+
+def write_table(solution, path, source=""):
+    """写出 tile 端可加载的 YAML 校正表（角度单位为 deg）"""
+    table = {str(row["tile"]): {
+        "correction_deg": round(float(np.rad2deg(row["correction"])), 4),
+        "std_deg": round(float(np.rad2deg(row["std"])), 4),
+        "sem_deg": round(float(np.rad2deg(row["sem"])), 4),
+        "n": int(row["n"]),
+    } for row in solution}
+    with open(path, "w") as f:
+        f.write(f"# generated by Process/calibration_solver.py{' from ' + source if source else ''}\n")
+        yaml.safe_dump(table, f, sort_keys=True)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="由 pilot/loopback 摘要离线求解每个 tile 的互易校准相位")
+    parser.add_argument("summaries", nargs="+",
+                        help="摘要文件：results.npz、*_result.jsonl、results-*.db 或 results_db.py 的 results.db")
+    parser.add_argument("--offsets", default=DEFAULT_OFFSETS, help="线缆相位表 config-phase-offsets.yml")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="输出的校正表")
+    parser.add_argument("--experiment", default=None, help="只使用该实验（unique_id）的测量")
+    parser.add_argument("--weight-by-std", action="store_true", help="按采集相位差的循环标准差加权")
+    parser.add_argument("--iterations", type=int, default=ROBUST_ITERATIONS, help="稳健加权的迭代次数")
+    parser.add_argument("--json", action="store_true", help="同时在标准输出打印 JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    table = np.concatenate([load_summaries(path) for path in args.summaries])
+    if args.experiment:
+        table = table[table["experiment"] == args.experiment]
+
+    tiles, corrections, weights = compute_corrections(table, load_cable_offsets(args.offsets), args.weight_by_std)
+    if len(tiles) == 0:
+        print("没有可配对的 pilot/loopback 测量。")
+        return
+
+    solution = solve(tiles, corrections, weights, args.iterations)
+    for row in solution:
+        print(f"{row['tile']}: {np.rad2deg(row['correction']):8.3f} deg  "
+              f"std {np.rad2deg(row['std']):6.3f}  sem {np.rad2deg(row['sem']):6.3f}  n {row['n']}")
+    write_table(solution, args.output, ", ".join(os.path.basename(p) for p in args.summaries))
+    print(f"{len(solution)} 个 tile 的校正表已保存至 {args.output}")
+    if args.json:
+        print(json.dumps({str(r["tile"]): float(r["correction"]) for r in solution}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+跨 tile 目录的原始采集懒加载数据集。
+
+collect_data.py 把每个 tile 的采集收集到 <数据根目录>/<tile 主机>/ 下，每个文件为 (2, n) 的 complex64。
+CaptureDataset 只在创建时扫描一次目录并读取各文件的 .npy 头（不读数据），之后：
+
+    ds = CaptureDataset("/media/sf_Shared/Data")
+    ds.shape                       # (tile, round, snapshot, channel, sample)
+    x = ds["A05", 1, 10:20, 0, :4096]   # 只读取需要的页面（mmap_mode='r'）
+    for row, start, block in ds.iter_chunks(chunk_samples=1 << 20):
+        ...                        # 逐块做不占内存的统计
+
+snapshot 轴是同一 (tile, round) 内按时间戳排序后的序号；不同文件长度不同时，
+超出文件长度的样本以 NaN 填充。
+"""
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from result_records import parse_capture_name
+
+MAX_OPEN_FILES = 256        # 同时保持打开的内存映射文件数
+
+INDEX_DTYPE = np.dtype([
+    ("tile", "U3"),
+    ("round", "i2"),
+    ("timestamp", "U15"),
+    ("snapshot", "i4"),
+    ("n_samples", "i8"),
+    ("path", "U256"),
+])
+
+
+def read_npy_shape(path):
+    """只读取 .npy 头，返回 (shape, dtype)"""
+    with open(path, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+    return shape, dtype
+
+
+def scan_captures(root, kind="pilot"):
+    """
+    扫描 root 下所有子目录（以及 root 本身）中的 Rx.py 采集文件，返回按 (tile, round, timestamp)
+    排序的索引（INDEX_DTYPE）。
+    """
+    rows = []
+    dirs = [root] + sorted(entry.path for entry in os.scandir(root) if entry.is_dir())
+    for directory in dirs:
+        for entry in os.scandir(directory):
+            if not (entry.is_file() and entry.name.endswith(".npy")):
+                continue
+            info = parse_capture_name(entry.name)
+            if info["kind"] != kind or not info["timestamp"]:
+                continue
+            try:
+                shape, _ = read_npy_shape(entry.path)
+            except (OSError, ValueError) as e:
+                print(f"跳过文件 {entry.path}: {e}")
+                continue
+            if len(shape) != 2:
+                continue
+            rows.append((info["tile"], info["round"], info["timestamp"], 0, shape[1], entry.path))
+
+    index = np.array(rows, dtype=INDEX_DTYPE)
+    index = index[np.lexsort((index["timestamp"], index["round"], index["tile"]))]
+
+    # snapshot：同一 (tile, round) 内的序号
+    group = np.char.add(index["tile"], index["round"].astype("U4"))
+    new_group = np.r_[True, group[1:] != group[:-1]] if len(index) else np.zeros(0, dtype=bool)
+    group_start = np.flatnonzero(new_group)[np.cumsum(new_group) - 1]
+    index["snapshot"] = np.arange(len(index)) - group_start
+    return index
+
+
+class CaptureDataset:
+    def __init__(self, root, kind="pilot"):
+        self.root = root
+        self.kind = kind
+        self.index = scan_captures(root, kind)
+        self.tiles = np.unique(self.index["tile"])
+        self.rounds = np.unique(self.index["round"])
+        n_snapshots = int(self.index["snapshot"].max()) + 1 if len(self.index) else 0
+        n_samples = int(self.index["n_samples"].max()) if len(self.index) else 0
+        self.shape = (len(self.tiles), len(self.rounds), n_snapshots, 2, n_samples)
+
+        # (tile, round, snapshot) → 索引行号，-1 表示没有该采集
+        self._lookup = np.full(self.shape[:3], -1, dtype=np.int64)
+        t = np.searchsorted(self.tiles, self.index["tile"])
+        r = np.searchsorted(self.rounds, self.index["round"])
+        self._lookup[t, r, self.index["snapshot"]] = np.arange(len(self.index))
+        self._open = OrderedDict()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __repr__(self):
+        return f"CaptureDataset({self.root!r}, captures={len(self)}, shape={self.shape})"
+
+    def open(self, row):
+        """返回第 row 个采集的只读内存映射（最近使用的文件保持打开）"""
+        path = self.index["path"][row]
+        data = self._open.pop(path, None)
+        if data is None:
+            data = np.load(path, mmap_mode="r")
+            if len(self._open) >= MAX_OPEN_FILES:
+                self._open.popitem(last=False)
+        self._open[path] = data
+        return data
+
+    @staticmethod
+    def _label_index(key, labels):
+        """tile 名 / 轮次号（标签）或位置切片 → 下标数组"""
+        if isinstance(key, slice):
+            return np.arange(len(labels))[key]
+        keys = np.atleast_1d(key)
+        pos = np.minimum(np.searchsorted(labels, keys), len(labels) - 1)
+        if len(labels) == 0 or np.any(labels[pos] != keys):
+            raise KeyError(f"{key} 不在 {labels.tolist()} 中")
+        return pos
+
+    def __getitem__(self, key):
+        """
+        ds[tile, round, snapshot, channel, sample]：tile 与 round 按标签索引（如 "A05"、1），
+        其余按下标。整数下标对应的轴会被去掉，与 NumPy 的语义一致。
+        """
+        key = key if isinstance(key, tuple) else (key,)
+        key = key + (slice(None),) * (5 - len(key))
+        tile_key, round_key, snap_key, ch_key, sample_key = key
+
+        tiles = self._label_index(tile_key, self.tiles)
+        rounds = self._label_index(round_key, self.rounds)
+        snaps = np.arange(self.shape[2])[snap_key] if isinstance(snap_key, slice) else np.atleast_1d(snap_key)
+        channels = np.arange(2)[ch_key]
+        samples = np.arange(self.shape[4])[sample_key]
+
+        out_shape = (len(tiles), len(rounds), len(snaps)) + np.shape(channels) + np.shape(samples)
+        out = np.full(out_shape, np.nan, dtype=np.complex64)
+        rows = self._lookup[np.ix_(tiles, rounds, snaps)]
+        for pos in zip(*np.nonzero(rows >= 0)):
+            row = rows[pos]
+            data = self.open(row)
+            valid = samples < data.shape[1]
+            if np.ndim(samples) == 0:
+                if valid:
+                    out[pos] = data[ch_key, int(samples)]
+            elif isinstance(sample_key, slice) and sample_key.step in (None, 1):
+                # 连续切片：直接切内存映射，只触及这些样本所在的页
+                n = int(valid.sum())
+                if n:
+                    out[pos][..., :n] = data[ch_key, samples[0]:samples[0] + n]
+            else:
+                out[pos][..., valid] = data[ch_key][..., samples[valid]]
+
+        # 整数下标对应的轴去掉
+        squeeze = tuple(axis for axis, k in enumerate((tile_key, round_key, snap_key))
+                        if np.ndim(k) == 0 and not isinstance(k, slice))
+        return out.squeeze(axis=squeeze) if squeeze else out
+
+    def select(self, tiles=None, rounds=None, start=None, end=None):
+        """按 tile、轮次和时间戳范围（YYYYMMDD_HHMMSS，含 start 不含 end）选取索引行号"""
+        mask = np.ones(len(self.index), dtype=bool)
+        if tiles is not None:
+            mask &= np.isin(self.index["tile"], np.atleast_1d(tiles))
+        if rounds is not None:
+            mask &= np.isin(self.index["round"], np.atleast_1d(rounds))
+        if start is not None:
+            mask &= self.index["timestamp"] >= start
+        if end is not None:
+            mask &= self.index["timestamp"] < end
+        return np.flatnonzero(mask)
+
+    def iter_chunks(self, chunk_samples=1 << 20, rows=None, channels=slice(None)):
+        """
+        逐个采集、逐个样本块地迭代，产生 (索引行号, 块起点, 数据块)。
+        数据块是内存映射的视图，处理后即可释放，整个 campaign 不必装入内存。
+        """
+        rows = range(len(self.index)) if rows is None else rows
+        for row in rows:
+            data = self.open(row)
+            for start in range(0, data.shape[1], chunk_samples):
+                yield row, start, data[channels, start:start + chunk_samples]
+
+    def reduce(self, func, init, chunk_samples=1 << 20, rows=None, channels=slice(None)):
+        """
+        对每个采集做块式归约：acc = func(acc, block)，从 init 开始，返回 {索引行号: acc}。
+        例如各通道能量：reduce(lambda acc, b: acc + np.sum(np.abs(b) ** 2, axis=-1), 0.0)
+        """
+        results = {}
+        for row, _, block in self.iter_chunks(chunk_samples, rows, channels):
+            results[row] = func(results.get(row, init), block)
+        return results
+
+    def close(self):
+        self._open.clear()
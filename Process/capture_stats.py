@@ -0,0 +1,167 @@
+"""
+processdata.ipynb 中 get_sorted_stats 的库版本与命令行工具：
+对一个目录中某一轮（round1/round2）的采集文件计算相位差循环均值/标准差（deg）与各通道最大 I/Q，
+按时间戳排序后以结构化数组返回。
+
+- 多进程并行处理文件；
+- 每个文件的结果缓存在目录下的 .capture_stats.json 中，以 (文件名, 大小, 修改时间, ESTIMATOR_VERSION)
+  为键，只有新增或变化的采集会重新计算。修改统计方法时请增加 ESTIMATOR_VERSION。
+"""
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import tools
+
+ESTIMATOR_VERSION = 1
+CACHE_NAME = ".capture_stats.json"
+
+# 字段顺序与 notebook 中的元组一致：stats[i][1] 为 circ_mean，stats[i][3] 为 max_I
+STATS_DTYPE = np.dtype([
+    ("timestamp", "U15"),
+    ("circ_mean", "f8"),        # deg
+    ("circ_std", "f8"),         # deg
+    ("max_I", "f8", (2,)),
+    ("max_Q", "f8", (2,)),
+    ("file", "U64"),
+])
+
+
+def parse_timestamp(filename, round_tag):
+    if round_tag not in filename:
+        return None
+    parts = filename.split(round_tag + "_")
+    if len(parts) < 2:
+        return None
+    timestamp_str = parts[1].replace(".npy", "")
+    if not timestamp_str:
+        return None
+    return timestamp_str
+
+
+def compute_circ_stats(iq_samples):
+    phase_ch0, _ = tools.get_phases_and_apply_bandpass(iq_samples[0, :], deg=True)
+    phase_ch1, _ = tools.get_phases_and_apply_bandpass(iq_samples[1, :], deg=True)
+    phase_diff = tools.to_min_pi_plus_pi(phase_ch0 - phase_ch1, deg=True)
+    circ_mean_val = tools.circmean(phase_diff, deg=True)
+    circ_std_val = tools.circstd(phase_diff, deg=True)
+    return circ_mean_val, circ_std_val
+
+
+def get_max_IQ(iq_samples):
+    max_I = np.max(np.abs(np.real(iq_samples)), axis=1)
+    max_Q = np.max(np.abs(np.imag(iq_samples)), axis=1)
+    return max_I, max_Q
+
+
+def file_stats(full_path):
+    """计算单个采集文件的统计量，返回 [circ_mean, circ_std, max_I, max_Q]（可直接写入 JSON）"""
+    iq_samples = np.load(full_path)
+    circ_mean_val, circ_std_val = compute_circ_stats(iq_samples)
+    max_I, max_Q = get_max_IQ(iq_samples)
+    return [float(circ_mean_val), float(circ_std_val), max_I.tolist(), max_Q.tolist()]
+
+
+def _file_stats_task(full_path):
+    """进程池任务：出错时返回错误信息而不是抛出，保证其余文件照常处理"""
+    try:
+        return full_path, file_stats(full_path), None
+    except Exception as e:
+        return full_path, None, str(e)
+
+
+def file_key(full_path):
+    st = os.stat(full_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "version": ESTIMATOR_VERSION}
+
+
+def load_cache(folder_path):
+    cache_path = os.path.join(folder_path, CACHE_NAME)
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(folder_path, cache):
+    cache_path = os.path.join(folder_path, CACHE_NAME)
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"无法写入缓存 {cache_path}: {e}")
+
+
+def get_sorted_stats(folder_path, round_tag, workers=None, use_cache=True):
+    """
+    返回目录中 round_tag 轮次所有采集的统计量（STATS_DTYPE 结构化数组，按时间戳排序）。
+    缓存命中的文件不再读取，其余文件并行计算。
+    """
+    cache = load_cache(folder_path) if use_cache else {}
+    rows, todo = [], []
+    for filename in sorted(os.listdir(folder_path)):
+        if not (filename.endswith(".npy") and round_tag in filename):
+            continue
+        timestamp_str = parse_timestamp(filename, round_tag)
+        if not timestamp_str:
+            continue
+        full_path = os.path.join(folder_path, filename)
+        entry = cache.get(filename)
+        if entry is not None and entry["key"] == file_key(full_path):
+            rows.append((timestamp_str, *entry["stats"], filename))
+        else:
+            todo.append((timestamp_str, filename, full_path))
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_file_stats_task, [full_path for _, _, full_path in todo], chunksize=4)
+            for (timestamp_str, filename, full_path), (_, stats, error) in zip(todo, results):
+                if error is not None:
+                    print(f"处理文件 {filename} 出错: {error}")
+                    continue
+                cache[filename] = {"key": file_key(full_path), "stats": stats}
+                rows.append((timestamp_str, *stats, filename))
+        if use_cache:
+            save_cache(folder_path, cache)
+
+    print(f"{os.path.basename(os.path.abspath(folder_path))} {round_tag}: {len(rows)} 个文件，"
+          f"重新计算 {len(todo)} 个")
+    stats = np.array(rows, dtype=STATS_DTYPE)
+    return stats[np.argsort(stats["timestamp"], kind="stable")]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="计算并缓存采集文件的相位差统计量（按时间戳排序）")
+    parser.add_argument("folders", nargs="+", help="采集文件目录（如 R1 R2 R3）")
+    parser.add_argument("--rounds", nargs="+", default=["round1", "round2"], help="轮次标签")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    parser.add_argument("--no-cache", action="store_true", help="忽略并不写入缓存")
+    parser.add_argument("--save", default=None, help="把结果另存为 .npz（键为 <目录名>_<轮次>）")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    saved = {}
+    for folder in args.folders:
+        for round_tag in args.rounds:
+            stats = get_sorted_stats(folder, round_tag, args.workers, use_cache=not args.no_cache)
+            saved[f"{os.path.basename(os.path.abspath(folder))}_{round_tag}"] = stats
+            for row in stats:
+                print(f"  {row['timestamp']}  circ_mean {row['circ_mean']:8.3f}  circ_std {row['circ_std']:7.3f}  "
+                      f"I [{row['max_I'][0]:.2f}, {row['max_I'][1]:.2f}]  Q [{row['max_Q'][0]:.2f}, {row['max_Q'][1]:.2f}]")
+    if args.save:
+        np.savez(args.save, **saved)
+        print(f"结果已保存至 {args.save}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,94 +1,182 @@
 import os
 import re
-import math
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
+from result_records import RESULT_DTYPE, load_results, parse_capture_name
+
+DATA_FOLDER = "Data"
+STORE_NAME = "results.npz"
+SEPARATOR = "-" * 40
+
+# 每行一个字段：字段行 → (正则, 写入的字段名)；所有字段在一次逐行扫描中取出
+VALUE = r"([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|nan|inf|-inf)"
+LINE_PATTERNS = {
+    "CircMean": (re.compile(r"CircMean phase diff:\s*" + VALUE), ("circ_mean",)),
+    "Linear": (re.compile(r"Linear mean phase diff:\s*" + VALUE), ("linear_mean",)),
+    "Frequency": (re.compile(r"Frequency offset CH([01]):\s*" + VALUE), None),
+    "Avg": (re.compile(r"Avg amplitude: CH0\s*" + VALUE + r",\s*CH1\s*" + VALUE),
+            ("avg_ampl_ch0", "avg_ampl_ch1")),
+    "Max I": (re.compile(r"Max I: CH0\s*" + VALUE + r",\s*CH1\s*" + VALUE), ("max_i_ch0", "max_i_ch1")),
+    "Max Q": (re.compile(r"Max Q: CH0\s*" + VALUE + r",\s*CH1\s*" + VALUE), ("max_q_ch0", "max_q_ch1")),
+}
+
 
-def process_device_file(file_path):
+def new_record(file_name, device_name):
+    """由 "Processing file:" 行开始一条新记录，名字中的字段先填好，数值字段为 NaN"""
+    record = dict.fromkeys(RESULT_DTYPE.names, np.nan)
+    record.update(parse_capture_name(file_name))
+    record["file"] = file_name
+    record["tile"] = record["tile"] or device_name
+    return record
+
+
+def parse_result_text(file_path):
+    """
+    逐行流式解析一个 *_result.txt（行状态机，不整体读入、不按分隔符切分）：
+      - "Processing file:" 开始一条记录；
+      - 字段行按行首关键字分派到对应的预编译正则；
+      - 分隔线结束记录，只保留含 CircMean 的记录；
+      - "Error processing" 丢弃当前记录。
+    返回 RESULT_DTYPE 结构化数组（文件顺序）。
+    """
+    device_name = os.path.basename(file_path).split("_")[0]
+    rows = []
+    record = None
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("Processing file:"):
+                record = new_record(line[len("Processing file:"):].strip(), device_name)
+            elif line.startswith(SEPARATOR):
+                if record is not None and not np.isnan(record["circ_mean"]):
+                    rows.append(tuple(record[name] for name in RESULT_DTYPE.names))
+                record = None
+            elif line.startswith("Error processing"):
+                record = None
+            elif record is not None:
+                for key, (pattern, fields) in LINE_PATTERNS.items():
+                    if not line.startswith(key):
+                        continue
+                    m = pattern.match(line)
+                    if m is None:
+                        break
+                    if fields is None:
+                        # Frequency offset CH0/CH1：通道号来自正则
+                        record["freq_offset_ch" + m.group(1)] = float(m.group(2))
+                    else:
+                        for name, value in zip(fields, m.groups()):
+                            record[name] = float(value)
+                    break
+    # 文件末尾没有分隔线的最后一条记录
+    if record is not None and not np.isnan(record["circ_mean"]):
+        rows.append(tuple(record[name] for name in RESULT_DTYPE.names))
+    return np.array(rows, dtype=RESULT_DTYPE)
+
+
+def parse_device(data_folder, device_name):
     """
-    处理单个设备文件：
-      - 按照分隔符 '----------------------------------------' 拆分数据段；
-      - 只提取包含 "round1" 的数据段；
-      - 从数据段中提取时间戳（格式 round1_YYYYMMDD_HHMMSS）和 “CircMean phase diff” 数值；
-      - 将 phase 数值转换为复数：实部为 cos(phase)，虚部为 sin(phase)；
-      - 按时间戳排序后返回一个列表，每个元素为一个复数。
+    读取一个设备的全部结果：优先使用 process_data.py 生成的 *_result.jsonl（已是类型化记录），
+    否则解析 *_result.txt。
     """
-    segments_data = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # 按照分隔符拆分数据段，并去除多余空白字符
-    segments = [seg.strip() for seg in content.split('----------------------------------------') if seg.strip()]
-
-    for seg in segments:
-        # 只处理包含 "Processing file:" 的数据段
-        if 'Processing file:' not in seg:
-            continue
-
-        # 提取 "Processing file:" 后面的文件名
-        m_file = re.search(r'Processing file:\s*(\S+)', seg)
-        if not m_file:
-            continue
-        filename = m_file.group(1)
-
-        # 只处理文件名中包含 "round1" 的数据段
-        if "round1" not in filename:
-            continue
-
-        # 从文件名中提取时间戳，格式假设为 round1_YYYYMMDD_HHMMSS
-        m_ts = re.search(r'round1_(\d{8}_\d{6})', filename)
-        if not m_ts:
-            continue
-        timestamp = m_ts.group(1)
-
-        # 提取 “CircMean phase diff” 数值（单位为 rad）
-        m_phase = re.search(r'CircMean phase diff:\s*([-+]?[0-9]*\.?[0-9]+)', seg)
-        if not m_phase:
-            continue
-        try:
-            phase_val = float(m_phase.group(1))
-        except ValueError:
-            continue
-
-        # 计算复数：实部为 cos(phase)，虚部为 sin(phase)
-        comp_value = complex(math.cos(phase_val), math.sin(phase_val))
-        segments_data.append((timestamp, comp_value))
-
-    # 根据时间戳排序（YYYYMMDD_HHMMSS 格式，直接字符串排序即可）
-    segments_data.sort(key=lambda x: x[0])
-
-    # 返回排序后的复数值列表
-    return [comp for ts, comp in segments_data]
+    jsonl_path = os.path.join(data_folder, f"{device_name}_result.jsonl")
+    if os.path.exists(jsonl_path):
+        return load_results(jsonl_path)
+    return parse_result_text(os.path.join(data_folder, f"{device_name}_result.txt"))
 
 
-def main():
-    # 设置 Data 文件夹路径（请根据实际情况调整）
-    data_folder = "Data"
-    if not os.path.exists(data_folder):
-        print(f"错误：目录 {data_folder} 不存在。")
-        return
+def list_devices(data_folder):
+    """Data 目录中所有有结果文件的设备（排序后，与旧版输出的行顺序一致）"""
+    names = set()
+    for file_name in os.listdir(data_folder):
+        for suffix in ("_result.txt", "_result.jsonl"):
+            if file_name.endswith(suffix):
+                names.add(file_name[:-len(suffix)])
+    return sorted(names)
+
+
+def build_store(data_folder=DATA_FOLDER, workers=None):
+    """
+    用进程池并行解析所有设备，合并为一张按 (tile, round, timestamp) 排序的表。
+    返回列式存储字典：每个字段一列，外加 tiles（设备名）与 tile_start（每个设备在表中的起始行）。
+    """
+    devices = list_devices(data_folder)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tables = list(executor.map(parse_device, [data_folder] * len(devices), devices))
+    for device_name, table in zip(devices, tables):
+        print(f"{device_name}: {len(table)} 条记录")
+
+    table = np.concatenate(tables) if tables else np.zeros(0, dtype=RESULT_DTYPE)
+    order = np.lexsort((table["timestamp"], table["round"], table["tile"]))
+    table = table[order]
 
-    device_files = sorted([f for f in os.listdir(data_folder) if f.endswith("_result.txt")])
-    all_device_results = []  # 每个元素为一个设备的测量数据列表（复数列表）
+    store = {name: table[name] for name in RESULT_DTYPE.names}
+    store["tiles"] = np.array(devices, dtype=RESULT_DTYPE["tile"])
+    store["tile_start"] = np.searchsorted(table["tile"], store["tiles"]).astype(np.int64)
+    return store
 
-    for file_name in device_files:
-        file_path = os.path.join(data_folder, file_name)
-        print(f"正在处理文件 {file_name}")
-        measurements = process_device_file(file_path)
-        all_device_results.append(measurements)
 
-    # 找出所有设备中测量数据的最大个数
-    max_length = max(len(row) for row in all_device_results) if all_device_results else 0
-    n_devices = len(all_device_results)
+def save_store(store, path):
+    # np.savez 的第一个参数名为 file，与 file 列同名，所以该列以 file_name 保存
+    np.savez(path, **{("file_name" if name == "file" else name): column for name, column in store.items()})
+
+
+def load_store(path):
+    """读取列式存储，返回 {列名: 数组}"""
+    with np.load(path) as data:
+        return {("file" if name == "file_name" else name): data[name] for name in data.files}
+
+
+def phase_matrix(store, round_no, field="circ_mean", tiles=None):
+    """
+    由列式存储得到某一轮的 NaN 填充复数矩阵（设备 × 测量次数），
+    元素为 exp(1j·phase)，每个设备的测量按时间戳排序 —— 与旧版 round*_phase_data.npy 相同。
+    不重新解析结果文件，只做一次向量化的分组与散列赋值。
+    """
+    tiles = store["tiles"] if tiles is None else np.asarray(tiles, dtype=store["tiles"].dtype)
+    sel = (store["round"] == round_no) & np.isin(store["tile"], tiles)
+    tile_col = store["tile"][sel]
+    phase = store[field][sel]
+
+    # 表已按 (tile, round, timestamp) 排序，所以同一设备的行连续，组内序号 = 行号 - 组起点
+    sorter = np.argsort(tiles)
+    row = sorter[np.searchsorted(tiles, tile_col, sorter=sorter)]
+    group_start = np.searchsorted(tile_col, tile_col, side="left")
+    col = np.arange(len(tile_col)) - group_start
+
+    counts = np.bincount(row, minlength=len(tiles))
+    result = np.full((len(tiles), counts.max() if len(counts) else 0), np.nan, dtype=complex)
+    result[row, col] = np.exp(1j * phase)
+    return result
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="解析 Data/*_result.txt，生成列式结果库与各轮相位矩阵")
+    parser.add_argument("--data", default=DATA_FOLDER, help="结果文件目录")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[1, 2], help="导出哪些轮次的 round*_phase_data.npy")
+    parser.add_argument("--workers", type=int, default=None, help="解析进程数（默认 CPU 核数）")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if not os.path.exists(args.data):
+        print(f"错误：目录 {args.data} 不存在。")
+        return
 
-    # 创建一个二维数组，填充值为 np.nan（注意：np.nan 对于复数数组会被视为 nan+0j）
-    result_array = np.full((n_devices, max_length), np.nan, dtype=complex)
-    for i, row in enumerate(all_device_results):
-        result_array[i, :len(row)] = row
+    store = build_store(args.data, args.workers)
+    store_path = os.path.join(args.data, STORE_NAME)
+    save_store(store, store_path)
+    print(f"共 {len(store['tile'])} 条记录，已保存列式结果库至 {store_path}")
 
-    # 保存为 npy 文件
-    np.save("round1_phase_data.npy", result_array)
-    print("所有设备数据已保存为二维数组至 round1_phase_data.npy")
+    for round_no in args.rounds:
+        out_name = f"round{round_no}_phase_data.npy"
+        np.save(out_name, phase_matrix(store, round_no))
+        print(f"所有设备数据已保存为二维数组至 {out_name}")
 
 
 if __name__ == "__main__":
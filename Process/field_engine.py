@@ -0,0 +1,360 @@
+"""
+波束赋形场计算引擎：在网格上计算 L 根天线的自由空间路径增益
+
+    hg = λ / (4π d) · exp(−j 2π d / λ),   y = hg · w
+
+所有网格点一次性向量化计算（complex64 矩阵乘法），按网格行分块以限制内存。
+beamform.py 与其它脚本共用。
+
+信道矩阵 H（网格点 × 天线）只取决于天线位置、波长和网格，PlaneField 把它缓存为
+.field_cache/ 下的 .npy 文件（以这些参数的哈希命名），以内存映射方式懒加载，
+不同运行、不同脚本共用；之后任意权重向量的场只需一次矩阵-向量乘法。
+多组权重（例如动画的所有帧）用 evaluate_frames() 做一次分块矩阵乘法，结果可直接写入内存映射文件。
+path_gain_sweep() 对一组载波频率计算同一平面的场，距离矩阵只算一次。
+replay_frames() 把实测的每 tile 相位快照（如 round1_phase_data.npy）按块转换为 MRT 场，逐帧惰性产生。
+
+path_gain_volume() 计算多个 z 平面（三维网格）的场：按 (平面, 网格行段) 分块交给进程池，
+各进程直接写入共享内存中的输出数组，并返回每块的耗时。
+
+    python field_engine.py --z-min 0 --z-max 2.4 --workers 8 --output volume.npy
+"""
+import os
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+import positions
+
+C = 3e8                         # 光速 (m/s)
+F = 920e6                       # 载波频率 (Hz)
+MEMORY_BUDGET = 256 * 2 ** 20   # 每块中间数组的内存上限（字节）
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".field_cache")
+CACHE_VERSION = 1               # 信道公式或存储格式改变时增加，旧缓存自动失效
+
+
+def grid_axes(x_min, x_max, y_min, y_max, dx, dy):
+    """与 beamform.py 相同的网格坐标轴（含终点附近一格）"""
+    return np.arange(x_min, x_max + dx, dx), np.arange(y_min, y_max + dy, dy)
+
+
+def distance_matrix(points, antenna_positions):
+    """网格点 (n, 3) 到各天线 (L, 3) 的距离 (n, L) float32，与频率无关"""
+    points = np.asarray(points, dtype=np.float32)
+    antennas = np.asarray(antenna_positions, dtype=np.float32)
+    d = np.empty((len(points), len(antennas)), dtype=np.float32)
+    np.sum(np.square(points[:, None, :] - antennas[None, :, :]), axis=-1, out=d)
+    np.sqrt(d, out=d)
+    return d
+
+
+def channel_matrix(points, antenna_positions, lambda_):
+    """
+    网格点 (n, 3) 到各天线 (L, 3) 的自由空间信道，返回 (n, L) complex64。
+    距离与相位用 float32 计算，结果写入预先分配的 complex64 数组，避免 complex128 中间量。
+    """
+    d = distance_matrix(points, antenna_positions)
+    h = np.empty(d.shape, dtype=np.complex64)
+    phase = d * np.float32(-2 * np.pi / lambda_)
+    amplitude = np.float32(lambda_ / (4 * np.pi)) / d
+    np.cos(phase, out=h.real)
+    np.sin(phase, out=h.imag)
+    h *= amplitude
+    return h
+
+
+def rows_per_chunk(nx, n_antennas, memory_budget=MEMORY_BUDGET):
+    """由内存预算决定每块的网格行数（每个 (点, 天线) 约需 距离 + 相位 + 幅度 + 信道 = 20 字节）"""
+    return max(1, int(memory_budget // (nx * n_antennas * 20)))
+
+
+def frames_per_block(n_frames, n_points, n_antennas, memory_budget=MEMORY_BUDGET):
+    """
+    多帧计算的分块大小 (帧数, 网格点数)：每块包含 H 的一段 (点, L) 与结果 (帧, 点)，各 8 字节/元素。
+    优先让一块包含全部帧，这样 H 只读一遍。
+    """
+    budget_elements = max(1, memory_budget // 8)
+    point_step = budget_elements // (n_antennas + n_frames)
+    if point_step >= 1024 or point_step >= n_points:
+        return n_frames, max(1, min(n_points, point_step))
+    point_step = min(n_points, max(1024, budget_elements // (2 * n_antennas)))
+    frame_step = max(1, (budget_elements - point_step * n_antennas) // point_step)
+    return min(n_frames, frame_step), point_step
+
+
+def plane_points(xv, rows, z):
+    """网格行 rows 上的点 (len(rows)·len(xv), 3)，按行优先排列（与 (ny, nx) 的 reshape 一致）"""
+    points = np.empty((len(rows), len(xv), 3), dtype=np.float32)
+    points[..., 0] = xv[None, :]
+    points[..., 1] = rows[:, None]
+    points[..., 2] = z
+    return points.reshape(-1, 3)
+
+
+def geometry_key(antenna_positions, lambda_, xv, yv, z):
+    """天线位置、波长与网格的哈希，作为缓存文件名"""
+    digest = hashlib.sha1()
+    digest.update(f"v{CACHE_VERSION}:{lambda_!r}:{float(z)!r}".encode())
+    for array in (antenna_positions, xv, yv):
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()[:20]
+
+
+def build_channel_cache(path, xv, yv, z, antenna_positions, lambda_, memory_budget=MEMORY_BUDGET):
+    """分块计算平面的信道矩阵并写入 path（(ny·nx, L) complex64 的 .npy），先写临时文件再改名"""
+    xv = np.asarray(xv, dtype=np.float32)
+    yv = np.asarray(yv, dtype=np.float32)
+    n_antennas = len(antenna_positions)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    out = open_memmap(tmp_path, mode="w+", dtype=np.complex64, shape=(len(yv) * len(xv), n_antennas))
+    step = rows_per_chunk(len(xv), n_antennas, memory_budget)
+    for r0 in range(0, len(yv), step):
+        rows = yv[r0:r0 + step]
+        out[r0 * len(xv):(r0 + len(rows)) * len(xv)] = channel_matrix(plane_points(xv, rows, z),
+                                                                       antenna_positions, lambda_)
+    out.flush()
+    del out
+    os.replace(tmp_path, path)
+
+
+class PlaneField:
+    """
+    固定天线几何下平面 z 的场计算。信道矩阵在第一次使用时从缓存加载（不存在时计算并写入缓存）。
+
+        field = PlaneField(xv, yv, 0.5, antenna_positions, lambda_)
+        y = field.evaluate(w)          # (ny, nx) complex64
+    """
+
+    def __init__(self, xv, yv, z, antenna_positions, lambda_, cache_dir=CACHE_DIR):
+        self.xv = np.asarray(xv)
+        self.yv = np.asarray(yv)
+        self.z = z
+        self.antenna_positions = np.asarray(antenna_positions)
+        self.lambda_ = lambda_
+        self.shape = (len(self.yv), len(self.xv))
+        self.cache_dir = cache_dir
+        self.key = geometry_key(self.antenna_positions, lambda_, self.xv, self.yv, z)
+        self._h = None
+
+    @property
+    def cache_path(self):
+        return os.path.join(self.cache_dir, f"plane_{self.key}.npy")
+
+    @property
+    def h(self):
+        """(ny·nx, L) complex64 信道矩阵（只读内存映射）"""
+        if self._h is None:
+            if not os.path.exists(self.cache_path):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                build_channel_cache(self.cache_path, self.xv, self.yv, self.z, self.antenna_positions, self.lambda_)
+            self._h = np.load(self.cache_path, mmap_mode="r")
+        return self._h
+
+    def evaluate(self, weights):
+        """权重向量 (L,) 的复数路径增益 (ny, nx)"""
+        return (self.h @ np.asarray(weights).astype(np.complex64)).reshape(self.shape)
+
+    def evaluate_frames(self, weights, path=None, memory_budget=MEMORY_BUDGET):
+        """
+        多组权重 (frames, L) 的路径增益 (frames, ny, nx) complex64，分块矩阵乘法 Y = W · Hᵀ。
+        path 给定时结果写入该 .npy（内存映射，返回可读写的 memmap），否则返回内存数组。
+        """
+        w = np.atleast_2d(np.asarray(weights)).astype(np.complex64)
+        n_frames, n_points = len(w), self.shape[0] * self.shape[1]
+        shape = (n_frames,) + self.shape
+        if path is None:
+            out = np.empty(shape, dtype=np.complex64)
+        else:
+            out = open_memmap(path, mode="w+", dtype=np.complex64, shape=shape)
+        flat = out.reshape(n_frames, n_points)
+        frame_step, point_step = frames_per_block(n_frames, n_points, w.shape[1], memory_budget)
+        h = self.h
+        for p0 in range(0, n_points, point_step):
+            h_block = np.ascontiguousarray(h[p0:p0 + point_step])
+            for f0 in range(0, n_frames, frame_step):
+                flat[f0:f0 + frame_step, p0:p0 + point_step] = w[f0:f0 + frame_step] @ h_block.T
+        if path is not None:
+            out.flush()
+        return out
+
+
+def measured_weights(phases):
+    """
+    实测信道快照 (..., tiles)（复数，NaN 表示缺失）的 MRT 权重 conj(h)；
+    缺失的 tile 权重为 0，不参与合成。
+    """
+    h = np.asarray(phases)
+    return np.where(np.isnan(h), 0, np.conj(h)).astype(np.complex64)
+
+
+def replay_frames(field, phase_data, memory_budget=MEMORY_BUDGET):
+    """
+    逐帧产生实测相位快照的 MRT 场 (ny, nx)。phase_data 为 (tiles, snapshots)，
+    tile 顺序与 field 的天线顺序一致（可以是内存映射）。每次只读取一块快照并整体计算，
+    块大小由内存预算决定，因此数千个快照也不需要同时放在内存中。
+    """
+    n_snapshots = phase_data.shape[1]
+    block = max(1, int(memory_budget // (field.shape[0] * field.shape[1] * 8)))
+    for s0 in range(0, n_snapshots, block):
+        weights = measured_weights(np.asarray(phase_data[:, s0:s0 + block]).T)
+        yield from field.evaluate_frames(weights, memory_budget=memory_budget)
+
+
+def path_gain_plane(xv, yv, z, antenna_positions, weights, lambda_, memory_budget=MEMORY_BUDGET):
+    """
+    平面 z 上网格 (len(yv), len(xv)) 的复数路径增益 y = H · w（complex64），不使用缓存。
+    按网格行分块，每块构造 (rows·nx, L) 信道矩阵后做一次矩阵-向量乘法。
+    """
+    xv = np.asarray(xv, dtype=np.float32)
+    yv = np.asarray(yv, dtype=np.float32)
+    w = np.asarray(weights).astype(np.complex64)
+    n_antennas = len(antenna_positions)
+    out = np.empty((len(yv), len(xv)), dtype=np.complex64)
+    step = rows_per_chunk(len(xv), n_antennas, memory_budget)
+    for r0 in range(0, len(yv), step):
+        rows = yv[r0:r0 + step]
+        h = channel_matrix(plane_points(xv, rows, z), antenna_positions, lambda_)
+        out[r0:r0 + len(rows)] = (h @ w).reshape(len(rows), len(xv))
+    return out
+
+
+CHUNK_TIMING_DTYPE = np.dtype([
+    ("plane", "i4"),            # z 平面序号
+    ("row", "i4"),              # 起始网格行
+    ("rows", "i4"),             # 行数
+    ("seconds", "f8"),
+    ("pid", "i4"),
+])
+
+_volume = {}                    # 工作进程中已打开的共享内存输出（由 _attach_volume 设置）
+
+
+def _attach_volume(name, shape, xv, yv, zv, antenna_positions, weights, lambda_):
+    """进程池初始化：打开共享内存输出数组，并保存所有块共用的参数"""
+    shm = shared_memory.SharedMemory(name=name)
+    _volume.update(shm=shm, out=np.ndarray(shape, dtype=np.complex64, buffer=shm.buf),
+                   xv=xv, yv=yv, zv=zv, antenna_positions=antenna_positions, weights=weights, lambda_=lambda_)
+
+
+def _volume_chunk(task):
+    """计算一块（平面 k 的 rows 行）并写入共享内存，返回耗时记录"""
+    k, r0, n_rows = task
+    start = time.perf_counter()
+    xv, rows = _volume["xv"], _volume["yv"][r0:r0 + n_rows]
+    h = channel_matrix(plane_points(xv, rows, _volume["zv"][k]), _volume["antenna_positions"], _volume["lambda_"])
+    _volume["out"][k, r0:r0 + n_rows] = (h @ _volume["weights"]).reshape(n_rows, len(xv))
+    return k, r0, n_rows, time.perf_counter() - start, os.getpid()
+
+
+def path_gain_volume(xv, yv, zv, antenna_positions, weights, lambda_, workers=None,
+                     memory_budget=MEMORY_BUDGET):
+    """
+    三维网格 (len(zv), len(yv), len(xv)) 的复数路径增益（complex64），用进程池并行计算。
+    memory_budget 为每个工作进程的中间数组上限。返回 (场, 每块耗时 CHUNK_TIMING_DTYPE)。
+    """
+    xv = np.asarray(xv, dtype=np.float32)
+    yv = np.asarray(yv, dtype=np.float32)
+    zv = np.atleast_1d(np.asarray(zv, dtype=np.float32))
+    antenna_positions = np.asarray(antenna_positions, dtype=np.float32)
+    w = np.asarray(weights).astype(np.complex64)
+    shape = (len(zv), len(yv), len(xv))
+    step = rows_per_chunk(len(xv), len(antenna_positions), memory_budget)
+    # 每个进程至少分到约 4 块，平面数少时也能均衡负载
+    n_workers = workers or os.cpu_count() or 1
+    step = max(1, min(step, -(-len(yv) * len(zv) // (4 * n_workers))))
+    tasks = [(k, r0, min(step, len(yv) - r0)) for k in range(len(zv)) for r0 in range(0, len(yv), step)]
+
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(np.complex64).itemsize)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_volume,
+                                 initargs=(shm.name, shape, xv, yv, zv, antenna_positions, w, lambda_)) as executor:
+            timings = np.array(list(executor.map(_volume_chunk, tasks)), dtype=CHUNK_TIMING_DTYPE)
+        out = np.ndarray(shape, dtype=np.complex64, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return out, timings
+
+
+def path_gain_sweep(xv, yv, z, antenna_positions, weights, freqs, memory_budget=MEMORY_BUDGET):
+    """
+    多个载波频率下平面 z 的复数路径增益 (len(freqs), ny, nx) complex64。
+    weights 为所有频率共用的 (L,) 或每个频率一组的 (len(freqs), L)。
+    每块网格行只计算一次距离与 1/(4π d)；每个频率复用同一组缓冲区，
+    相位 −2π f d / c 原地写入，cos/sin 直接写入复数缓冲区的实部与虚部，λ/(4π) 中的 λ 最后作为标量乘上。
+    """
+    xv = np.asarray(xv, dtype=np.float32)
+    yv = np.asarray(yv, dtype=np.float32)
+    freqs = np.atleast_1d(np.asarray(freqs, dtype=np.float64))
+    w = np.asarray(weights).astype(np.complex64)
+    w = np.broadcast_to(w, (len(freqs), w.shape[-1]))
+    n_antennas = len(antenna_positions)
+    out = np.empty((len(freqs), len(yv), len(xv)), dtype=np.complex64)
+    step = rows_per_chunk(len(xv), n_antennas, memory_budget)
+    for r0 in range(0, len(yv), step):
+        rows = yv[r0:r0 + step]
+        d = distance_matrix(plane_points(xv, rows, z), antenna_positions)
+        inv_d = np.float32(1 / (4 * np.pi)) / d
+        phase = np.empty_like(d)
+        h = np.empty(d.shape, dtype=np.complex64)
+        for k, f in enumerate(freqs):
+            lambda_ = C / f
+            np.multiply(d, np.float32(-2 * np.pi / lambda_), out=phase)
+            np.cos(phase, out=h.real)
+            np.sin(phase, out=h.imag)
+            h *= inv_d
+            y = h @ w[k]
+            y *= np.float32(lambda_)
+            out[k, r0:r0 + len(rows)] = y.reshape(len(rows), len(xv))
+    return out
+
+
+def path_gain_db(y):
+    """路径增益（dB）：10·log10(|y|²)"""
+    return 10 * np.log10(np.abs(y) ** 2)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="多平面（三维）路径增益计算，进程池并行")
+    parser.add_argument("--x", nargs=2, type=float, default=(0, 8), metavar=("MIN", "MAX"))
+    parser.add_argument("--y", nargs=2, type=float, default=(0, 4), metavar=("MIN", "MAX"))
+    parser.add_argument("--z", nargs="+", type=float, default=None, help="z 平面列表（m），不给时用 --z-min/--z-max")
+    parser.add_argument("--z-min", type=float, default=0.0)
+    parser.add_argument("--z-max", type=float, default=2.4)
+    parser.add_argument("--resolution", type=float, default=0.1, help="网格间距（以波长为单位）")
+    parser.add_argument("--weights", default=None, help="权重向量 .npy (L,)，默认全 1")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="volume_path_gain.npy", help="输出 (nz, ny, nx) complex64")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    lambda_ = C / F
+    step = lambda_ * args.resolution
+    xv, yv = grid_axes(args.x[0], args.x[1], args.y[0], args.y[1], step, step)
+    zv = np.asarray(args.z) if args.z else np.arange(args.z_min, args.z_max + step, step)
+    antenna_positions = positions.antenna_positions()
+    weights = np.load(args.weights) if args.weights else np.ones(len(antenna_positions))
+
+    print(f"网格 {len(zv)} × {len(yv)} × {len(xv)} = {len(zv) * len(yv) * len(xv)} 点，{len(antenna_positions)} 根天线")
+    start = time.perf_counter()
+    volume, timings = path_gain_volume(xv, yv, zv, antenna_positions, weights, lambda_, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    np.save(args.output, volume)
+
+    print(f"{len(timings)} 块，总耗时 {elapsed:.2f} s；每块 平均 {timings['seconds'].mean():.3f} s，"
+          f"最长 {timings['seconds'].max():.3f} s，{len(np.unique(timings['pid']))} 个进程")
+    for k in range(len(zv)):
+        print(f"  z = {zv[k]:.3f} m: {timings['seconds'][timings['plane'] == k].sum():.3f} s")
+    print(f"结果已保存至 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
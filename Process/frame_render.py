@@ -0,0 +1,175 @@
+"""
+预先计算好的场帧（field_engine.PlaneField.evaluate_frames 的 (frames, ny, nx) 结果）并行渲染为视频。
+
+  - 每个工作进程只创建一次 Agg 图形：heatmap 模式复用同一个 imshow 对象（set_data），
+    surface 模式每帧只替换曲面，不重新布局坐标轴与颜色条；
+  - 渲染出的 RGB 帧按顺序直接写入 ffmpeg 的标准输入（rawvideo），不生成中间图片；
+  - 统计各阶段耗时：读取/换算 dB、绘制、取像素（工作进程内累计），写入编码器与等待编码结束（主进程）。
+
+    python frame_render.py random_phase_path_gain.npy out.mp4 --mode heatmap --workers 8
+"""
+import os
+import time
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+FPS = 10
+DPI = 100
+FIGSIZE = (10, 7)
+VMIN, VMAX = -30, 0
+WINDOW_PER_WORKER = 4           # 每个进程同时在途的帧数，限制等待写入的帧占用的内存
+
+STAGES = ("load", "draw", "readout")
+
+_renderer = {}                  # 工作进程中的图形与数据（由 _init_renderer 设置）
+
+
+def to_db(frame):
+    """复数路径增益转为 dB；实数帧视为已经是 dB"""
+    if np.iscomplexobj(frame):
+        return 10 * np.log10(np.abs(frame) ** 2)
+    return np.asarray(frame, dtype=np.float64)
+
+
+def _init_renderer(frames_path, mode, xv, yv, vmin, vmax, figsize, dpi, title):
+    """进程池初始化：打开帧文件（内存映射），建立一次图形"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    frames = np.load(frames_path, mmap_mode="r")
+    ny, nx = frames.shape[1:]
+    xv = np.arange(nx) if xv is None else np.asarray(xv)
+    yv = np.arange(ny) if yv is None else np.asarray(yv)
+    fig = plt.figure(figsize=figsize, dpi=dpi)
+    if mode == "heatmap":
+        ax = fig.add_subplot(111)
+        artist = ax.imshow(np.full((ny, nx), vmin, dtype=np.float32), origin="lower", cmap="viridis",
+                           vmin=vmin, vmax=vmax, aspect="equal",
+                           extent=(xv[0], xv[-1], yv[0], yv[-1]))
+        fig.colorbar(artist, ax=ax, label="Path Gain (PG) in dB")
+        ax.set_xlabel("X in m")
+        ax.set_ylabel("Y in m")
+    else:
+        ax = fig.add_subplot(111, projection="3d")
+        ax.set_zlim(vmin, vmax)
+        ax.set_xlabel("X in m")
+        ax.set_ylabel("Y in m")
+        ax.set_zlabel("Path Gain (PG) in dB")
+        artist = None
+    _renderer.update(frames=frames, mode=mode, fig=fig, ax=ax, artist=artist, vmin=vmin, vmax=vmax,
+                     mesh=np.meshgrid(xv, yv), title=title, text=ax.set_title(""))
+
+
+def _render_frame(index):
+    """渲染一帧，返回 (RGB 字节, 各阶段耗时)"""
+    r = _renderer
+    t0 = time.perf_counter()
+    pg_db = to_db(r["frames"][index])
+    t1 = time.perf_counter()
+    if r["mode"] == "heatmap":
+        r["artist"].set_data(pg_db)
+    else:
+        if r["artist"] is not None:
+            r["artist"].remove()
+        r["artist"] = r["ax"].plot_surface(r["mesh"][0], r["mesh"][1], pg_db, vmin=r["vmin"], vmax=r["vmax"],
+                                           cmap="viridis")
+    r["text"].set_text(r["title"].format(frame=index + 1))
+    r["fig"].canvas.draw()
+    t2 = time.perf_counter()
+    rgb = np.asarray(r["fig"].canvas.buffer_rgba())[..., :3].tobytes()
+    t3 = time.perf_counter()
+    return rgb, (t1 - t0, t2 - t1, t3 - t2)
+
+
+def frame_size(figsize=FIGSIZE, dpi=DPI):
+    """Agg 画布的像素尺寸 (宽, 高)"""
+    return int(round(figsize[0] * dpi)), int(round(figsize[1] * dpi))
+
+
+def encoder_command(output, size, fps=FPS, ffmpeg="ffmpeg"):
+    """从标准输入读取 rgb24 原始帧的 ffmpeg 命令（宽高补齐为偶数以满足 yuv420p）"""
+    return [ffmpeg, "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-",
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-c:v", "libx264", "-pix_fmt", "yuv420p", output]
+
+
+def render(frames_path, output, mode="heatmap", xv=None, yv=None, vmin=VMIN, vmax=VMAX, fps=FPS,
+           workers=None, figsize=FIGSIZE, dpi=DPI, title="Frame {frame}", ffmpeg="ffmpeg", command=None):
+    """
+    把 frames_path（(frames, ny, nx) 的 .npy，复数或 dB）渲染为视频 output。
+    mode 为 "heatmap"（二维，快）或 "surface"（三维曲面）。command 可替换默认的 ffmpeg 命令。
+    返回各阶段耗时（秒）的字典。
+    """
+    n_frames = np.load(frames_path, mmap_mode="r").shape[0]
+    size = frame_size(figsize, dpi)
+    command = command or encoder_command(output, size, fps, ffmpeg)
+    workers = workers or os.cpu_count() or 1
+    window = workers * WINDOW_PER_WORKER
+
+    timings = dict.fromkeys(STAGES + ("write", "encode", "total"), 0.0)
+    start = time.perf_counter()
+    encoder = subprocess.Popen(command, stdin=subprocess.PIPE)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_renderer,
+                                 initargs=(frames_path, mode, xv, yv, vmin, vmax, figsize, dpi, title)) as executor:
+            for w0 in range(0, n_frames, window):
+                for rgb, stage_times in executor.map(_render_frame, range(w0, min(w0 + window, n_frames))):
+                    if len(rgb) != size[0] * size[1] * 3:
+                        raise RuntimeError(f"帧大小 {len(rgb)} 字节与 {size[0]}x{size[1]} 不符")
+                    for stage, seconds in zip(STAGES, stage_times):
+                        timings[stage] += seconds
+                    t = time.perf_counter()
+                    encoder.stdin.write(rgb)
+                    timings["write"] += time.perf_counter() - t
+        encoder.stdin.close()
+        t = time.perf_counter()
+        if encoder.wait() != 0:
+            raise RuntimeError(f"编码器退出码 {encoder.returncode}: {' '.join(command)}")
+        timings["encode"] = time.perf_counter() - t
+    finally:
+        if encoder.poll() is None:
+            encoder.kill()
+    timings["total"] = time.perf_counter() - start
+    timings["frames"] = n_frames
+    return timings
+
+
+def print_timings(timings, workers=None):
+    workers = workers or os.cpu_count() or 1
+    n = max(timings["frames"], 1)
+    print(f"{timings['frames']} 帧，总耗时 {timings['total']:.2f} s（{timings['frames'] / timings['total']:.1f} 帧/s，"
+          f"{workers} 个进程）")
+    for stage in STAGES:
+        print(f"  {stage:8s} 累计 {timings[stage]:8.2f} s  每帧 {1e3 * timings[stage] / n:7.2f} ms（工作进程）")
+    print(f"  {'write':8s} 累计 {timings['write']:8.2f} s（主进程写入编码器）")
+    print(f"  {'encode':8s} 收尾 {timings['encode']:8.2f} s")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="并行渲染预先计算的场帧并直接编码为视频")
+    parser.add_argument("frames", help="(frames, ny, nx) 的 .npy（复数路径增益或 dB）")
+    parser.add_argument("output", help="输出视频，例如 out.mp4")
+    parser.add_argument("--mode", choices=("heatmap", "surface"), default="heatmap")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--fps", type=int, default=FPS)
+    parser.add_argument("--dpi", type=int, default=DPI)
+    parser.add_argument("--vmin", type=float, default=VMIN)
+    parser.add_argument("--vmax", type=float, default=VMAX)
+    parser.add_argument("--ffmpeg", default="ffmpeg", help="ffmpeg 可执行文件")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    timings = render(args.frames, args.output, mode=args.mode, vmin=args.vmin, vmax=args.vmax, fps=args.fps,
+                     workers=args.workers, dpi=args.dpi, ffmpeg=args.ffmpeg)
+    print_timings(timings, args.workers)
+    print(f"视频已保存至 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
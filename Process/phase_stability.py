@@ -0,0 +1,208 @@
+"""
+CH0−CH1 相位差的稳定性分析：重叠 Allan 偏差、修正 Allan 偏差（及 TDEV）、漂移率、
+相位游走（相位结构函数）与游走功率谱。
+
+所有函数沿最后一维计算，前面的维度是批（多个采集 / tile），例如 (captures, samples)。
+Allan 类统计用累加和实现，每个 τ 的代价为 O(N)，对数百万样本也只需几秒。
+
+相位差 x(t) 的单位为 rad。ADEV/MDEV 为相位差变化率的稳定度（rad/s），
+TDEV 与相位游走为 rad，可直接和校准允许的相位误差比较：
+validity_time() 给出相位游走超过容差之前的最长时间，即一次 usrp-cal-bf.py 校准可以使用多久。
+"""
+import os
+import argparse
+
+import numpy as np
+from scipy.signal import welch
+
+import tools
+
+RATE = 250e3
+SETTLE_SAMPLES = 5000       # 带通滤波器的暂态，与 tools.get_phases_and_remove_CFO 相同
+
+
+def phase_difference(iq, fs=RATE, settle=SETTLE_SAMPLES):
+    """
+    由 (..., 2, n) 的 IQ 采集计算展开后的 CH0−CH1 相位差（rad），形状 (..., n - settle)。
+    两个通道先经过与 tools 相同的带通滤波。
+    """
+    iq = np.asarray(iq)
+    sos = tools.butter_bandpass(tools.lowcut, tools.highcut, fs, order=9)
+    filtered = tools.butter_bandpass_filter(iq.real, tools.lowcut, tools.highcut, fs, sos=sos) + \
+        1j * tools.butter_bandpass_filter(iq.imag, tools.lowcut, tools.highcut, fs, sos=sos)
+    diff = np.angle(filtered[..., 0, settle:] * np.conj(filtered[..., 1, settle:]))
+    return np.unwrap(diff, axis=-1)
+
+
+def default_taus(n_samples, fs=RATE, per_decade=5, max_fraction=1 / 3):
+    """对数间隔的平均因子 m（样本数），对应 τ = m / fs，最大为 n_samples·max_fraction"""
+    max_m = max(1, int(n_samples * max_fraction))
+    m = np.unique(np.round(np.logspace(0, np.log10(max_m), int(np.log10(max_m) * per_decade) + 1)).astype(np.int64))
+    return m, m / fs
+
+
+def _cumsum0(x):
+    """前面补 0 的累加和：C[k] = sum(x[:k])，窗口和 sum(x[j:j+m]) = C[j+m] - C[j]"""
+    c = np.zeros(x.shape[:-1] + (x.shape[-1] + 1,), dtype=np.float64)
+    np.cumsum(x, axis=-1, out=c[..., 1:])
+    return c
+
+
+def overlapping_adev(x, fs=RATE, m_list=None):
+    """
+    重叠 Allan 偏差（相位数据形式）：
+        σ²(τ) = Σ (x[i+2m] − 2x[i+m] + x[i])² / (2 τ² (N − 2m)),  τ = m / fs
+    返回 (taus, adev)，adev 形状 (..., len(taus))。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    m_list = default_taus(n, fs, max_fraction=1 / 2)[0] if m_list is None else np.asarray(m_list)
+    m_list = m_list[2 * m_list < n]
+    out = np.empty(x.shape[:-1] + (len(m_list),))
+    for k, m in enumerate(m_list):
+        d = x[..., 2 * m:] - 2 * x[..., m:n - m] + x[..., :n - 2 * m]
+        tau = m / fs
+        out[..., k] = np.sqrt(np.mean(d * d, axis=-1) / (2 * tau * tau))
+    return m_list / fs, out
+
+
+def modified_adev(x, fs=RATE, m_list=None):
+    """
+    修正 Allan 偏差，用一次累加和得到所有长度为 m 的窗口平均：
+        σ²_mod(τ) = Σ_j [Σ_{i=j}^{j+m-1} (x[i+2m] − 2x[i+m] + x[i])]² / (2 m² τ² (N − 3m + 1))
+    返回 (taus, mdev, tdev)，TDEV = τ·MDEV/√3（rad）。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    m_list = default_taus(n, fs)[0] if m_list is None else np.asarray(m_list)
+    m_list = m_list[3 * m_list <= n]
+    # 减去首值以减小累加和的数值误差
+    c = _cumsum0(x - x[..., :1])
+    mdev = np.empty(x.shape[:-1] + (len(m_list),))
+    for k, m in enumerate(m_list):
+        j = n - 3 * m + 1
+        w0 = c[..., m:m + j] - c[..., :j]
+        w1 = c[..., 2 * m:2 * m + j] - c[..., m:m + j]
+        w2 = c[..., 3 * m:3 * m + j] - c[..., 2 * m:2 * m + j]
+        d = w2 - 2 * w1 + w0
+        tau = m / fs
+        mdev[..., k] = np.sqrt(np.mean(d * d, axis=-1) / (2 * m * m * tau * tau))
+    taus = m_list / fs
+    return taus, mdev, taus * mdev / np.sqrt(3)
+
+
+def drift_rate(x, fs=RATE):
+    """
+    最小二乘线性漂移率（rad/s）与去掉漂移后的残差 RMS（rad），批量闭式计算。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    t = (np.arange(n) - (n - 1) / 2) / fs
+    x_mean = np.mean(x, axis=-1, keepdims=True)
+    slope = np.sum((x - x_mean) * t, axis=-1) / np.sum(t * t)
+    residual = x - x_mean - slope[..., None] * t
+    return slope, np.sqrt(np.mean(residual * residual, axis=-1))
+
+
+def phase_wander(x, fs=RATE, m_list=None):
+    """
+    相位游走（结构函数）：间隔 τ 的两个时刻相位差变化的 RMS（rad），
+        D(τ) = sqrt(mean((x[i+m] − x[i])²))
+    即在 τ 时刻做校准、之后使用时的典型相位误差。返回 (taus, wander)。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    m_list = default_taus(n, fs, max_fraction=1 / 2)[0] if m_list is None else np.asarray(m_list)
+    m_list = m_list[m_list < n]
+    out = np.empty(x.shape[:-1] + (len(m_list),))
+    for k, m in enumerate(m_list):
+        d = x[..., m:] - x[..., :n - m]
+        out[..., k] = np.sqrt(np.mean(d * d, axis=-1))
+    return m_list / fs, out
+
+
+def validity_time(taus, wander, tolerance_rad):
+    """相位游走首次超过容差之前的最长 τ（秒），批量；从一开始就超过时为 0，始终未超过时为最大 τ"""
+    wander = np.asarray(wander)
+    exceeded = wander > tolerance_rad
+    first = np.where(exceeded.any(axis=-1), exceeded.argmax(axis=-1), len(taus))
+    padded = np.concatenate(([0.0], np.asarray(taus)))
+    return padded[first]
+
+
+def wander_spectrum(x, fs=RATE, nperseg=1 << 16):
+    """去除线性漂移后的相位差功率谱（Welch，rad²/Hz），返回 (freqs, psd)"""
+    x = np.asarray(x, dtype=np.float64)
+    nperseg = min(nperseg, x.shape[-1])
+    return welch(x, fs=fs, nperseg=nperseg, detrend="linear", axis=-1)
+
+
+def analyse(x, fs=RATE, tolerance_deg=5.0):
+    """对一批相位差 (..., n) 计算全部稳定性指标，返回字典（各项都保留批维度）"""
+    slope, residual = drift_rate(x, fs)
+    taus, adev = overlapping_adev(x, fs)
+    mod_taus, mdev, tdev = modified_adev(x, fs)
+    wander_taus, wander = phase_wander(x, fs)
+    freqs, psd = wander_spectrum(x, fs)
+    return {
+        "drift_rate": slope, "residual_rms": residual,
+        "taus": taus, "adev": adev,
+        "mod_taus": mod_taus, "mdev": mdev, "tdev": tdev,
+        "wander_taus": wander_taus, "wander": wander,
+        "validity_time": validity_time(wander_taus, wander, np.deg2rad(tolerance_deg)),
+        "freqs": freqs, "psd": psd,
+    }
+
+
+def batch_phase_differences(paths, fs=RATE, n_samples=None):
+    """
+    读取多个采集并计算相位差，截断到相同长度后堆叠为 (captures, n) 以便批量计算。
+    采集以内存映射方式打开，只读取前 n_samples 个样本。
+    """
+    phases = []
+    for path in paths:
+        iq = np.load(path, mmap_mode="r")
+        phases.append(phase_difference(iq[:, :n_samples] if n_samples else iq, fs))
+    n = min(len(p) for p in phases)
+    return np.stack([p[:n] for p in phases])
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="CH0−CH1 相位差稳定性分析（Allan 偏差、漂移、游走）")
+    parser.add_argument("paths", nargs="+", help="采集文件（.npy）或包含采集文件的目录")
+    parser.add_argument("--samples", type=int, default=None, help="每个采集最多使用的样本数")
+    parser.add_argument("--tolerance", type=float, default=5.0, help="允许的相位误差（deg）")
+    parser.add_argument("--save", default=None, help="把结果保存为 .npz")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths += sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".npy"))
+        else:
+            paths.append(path)
+    if not paths:
+        print("没有找到采集文件。")
+        return
+
+    x = batch_phase_differences(paths, n_samples=args.samples)
+    result = analyse(x, tolerance_deg=args.tolerance)
+
+    print(f"{len(paths)} 个采集，每个 {x.shape[-1]} 个样本（{x.shape[-1] / RATE:.2f} s）")
+    for k, path in enumerate(paths):
+        print(f"{os.path.basename(path)}: 漂移 {np.rad2deg(result['drift_rate'][k]):+.4f} deg/s, "
+              f"残差 {np.rad2deg(result['residual_rms'][k]):.4f} deg, "
+              f"{args.tolerance} deg 容差内有效 {result['validity_time'][k]:.3f} s")
+    for tau, tdev in zip(result["mod_taus"], np.rad2deg(result["tdev"]).mean(axis=0)):
+        print(f"  τ = {tau:10.6f} s  平均 TDEV = {tdev:.5f} deg")
+
+    if args.save:
+        np.savez(args.save, files=np.array([os.path.basename(p) for p in paths]), **result)
+        print(f"结果已保存至 {args.save}")
+
+
+if __name__ == "__main__":
+    main()
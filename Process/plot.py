@@ -1,34 +1,77 @@
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-# 读取指定工作表（假设名称为 "Sheet1"）
-df = pd.read_excel("phase_data.xlsx", sheet_name="Sheet1")
+import tools
+
+# 优先从结果数据库（results_db.py）读取，没有数据库时读取 phase_data.xlsx
+DB_PATH = os.path.join("Data", "results.db")
+TILE = sys.argv[1] if len(sys.argv) > 1 else None     # 例如 python plot.py A05
+
+
+def load_from_db(db_path, tile=None):
+    """由数据库中某个 tile 的 pilot 记录生成与 Excel 两个工作表相同列名的数据（RX1/RX2 即 CH0/CH1）"""
+    from results_db import ResultsDB
+
+    db = ResultsDB(db_path)
+    try:
+        tile = tile or db.tiles()[0]
+        rows = db.query(tile=tile, kind="pilot", order="timestamp")
+    finally:
+        db.close()
+    timestamps = pd.to_datetime(pd.Series(rows["timestamp"]), format="%Y%m%d_%H%M%S", errors="coerce")
+    df = pd.DataFrame({
+        "Timestamp": timestamps,
+        # circ_mean 为弧度，Excel 中为 (-180, 180] 范围内的角度，换算后两种来源的刻度一致
+        "Difference between RX1 and RX2": tools.to_min_pi_plus_pi(np.degrees(rows["circ_mean"]), deg=True),
+    })
+    df2 = pd.DataFrame({
+        "Timestamp": timestamps,
+        "RX1_max_I": rows["max_i_ch0"],
+        "RX2_max_I": rows["max_i_ch1"],
+        "RX1_max_Q": rows["max_q_ch0"],
+        "RX2_max_Q": rows["max_q_ch1"],
+    })
+    return df, df2, f"{tile} (results.db)"
+
 
-# 将 Timestamp 转为日期格式（如果需要）
-df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+def load_from_excel(path="phase_data.xlsx"):
+    # 读取指定工作表（假设名称为 "Sheet1"）
+    df = pd.read_excel(path, sheet_name="Sheet1")
+    # 读取 Sheet2（假设表头分别为 "Timestamp", "RX1_max_I", "RX2_max_I", "RX1_max_Q", "RX2_max_Q"）
+    df2 = pd.read_excel(path, sheet_name="Sheet2")
+    # 将 Timestamp 转为日期格式（如果需要）
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+    df2["Timestamp"] = pd.to_datetime(df2["Timestamp"])
+    return df, df2, "Sheet1"
+
+
+if os.path.exists(DB_PATH):
+    df, df2, title = load_from_db(DB_PATH, TILE)
+else:
+    df, df2, title = load_from_excel()
 
 # 生成测量序号（1, 2, 3, ...）
 measurement_numbers = range(1, len(df) + 1)
 
-# 绘制各项数据随测量次数的变化
+# 绘制各项数据随测量次数的变化（数据库中只有两通道的相位差）
 plt.figure(figsize=(10, 6))
-plt.plot(measurement_numbers, df['RX1_phase'], marker='o', label='RX1_phase')
-plt.plot(measurement_numbers, df['RX2_phase'], marker='o', label='RX2_phase')
-plt.plot(measurement_numbers, df['Difference between RX1 and RX2'], marker='o', label='Difference')
+for column, label in (("RX1_phase", "RX1_phase"), ("RX2_phase", "RX2_phase"),
+                      ("Difference between RX1 and RX2", "Difference")):
+    if column in df:
+        plt.plot(measurement_numbers, df[column], marker='o', label=label)
 plt.xlabel("Measurement")
 plt.ylabel("Value")
-plt.title("Measurement Changes - Sheet1")
-plt.xticks(measurement_numbers)  # 将 x 轴刻度设置为测量序号
+plt.title(f"Measurement Changes - {title}")
+if len(df) <= 50:
+    plt.xticks(measurement_numbers)  # 将 x 轴刻度设置为测量序号
 plt.legend()
 plt.tight_layout()
 plt.show()
 
-# 读取 Sheet2（假设表头分别为 "Timestamp", "RX1_max_I", "RX2_max_I", "RX1_max_Q", "RX2_max_Q"）
-df2 = pd.read_excel("phase_data.xlsx", sheet_name="Sheet2")
-
-# 将 Timestamp 转为日期格式（如果需要）
-df2["Timestamp"] = pd.to_datetime(df2["Timestamp"])
-
 # 生成测量序号（1, 2, 3, ...）
 measurement_numbers = range(1, len(df2) + 1)
 
@@ -40,8 +83,9 @@ plt.plot(measurement_numbers, df2['RX1_max_Q'], marker='o', label='RX1_max_Q')
 plt.plot(measurement_numbers, df2['RX2_max_Q'], marker='o', label='RX2_max_Q')
 plt.xlabel("Measurement")
 plt.ylabel("Value")
-plt.title("Measurement Changes - Sheet2")
-plt.xticks(measurement_numbers)  # 设置 x 轴刻度为测量次数
+plt.title(f"Measurement Changes - {title if title != 'Sheet1' else 'Sheet2'}")
+if len(df2) <= 50:
+    plt.xticks(measurement_numbers)  # 设置 x 轴刻度为测量次数
 plt.legend()
 plt.tight_layout()
-plt.show()
\ No newline at end of file
+plt.show()
@@ -0,0 +1,108 @@
+"""
+天线位置：读取本地 positions.yml（与 TechtilePlotter 仓库中的文件相同，无需联网），
+解析结果缓存为同目录下的二进制索引 .positions_cache.npy（结构化数组，内存映射读取）。
+缓存以 positions.yml 的大小与修改时间校验，不一致时再比较内容的 SHA-1，确有变化才重新解析 YAML。
+
+    import positions
+    xyz = positions.antenna_positions(["A05", "A06"])        # (n, 3)，channel 1
+    table = positions.load_positions()                      # 全部 tile × channel
+"""
+import os
+import json
+import hashlib
+
+import numpy as np
+
+POSITIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "positions.yml")
+CACHE_NAME = ".positions_cache.npy"
+CACHE_META_NAME = ".positions_cache.json"
+CACHE_VERSION = 1
+
+POSITION_DTYPE = np.dtype([
+    ("tile", "U3"),
+    ("ch", "i1"),
+    ("xyz", "f8", (3,)),        # 天线位置 (m)
+    ("normal", "f8", (3,)),     # 天线朝向 (vx, vy, vz)
+])
+
+
+def parse_positions(path=POSITIONS_PATH):
+    """解析 positions.yml 的 antennes 部分，返回 POSITION_DTYPE 数组（按文件顺序）"""
+    import yaml
+
+    with open(path, "r") as f:
+        config = yaml.safe_load(f)
+    rows = [(str(ap["tile"]), ch["ch"], (ch["x"], ch["y"], ch["z"]),
+             (ch.get("vx", 0), ch.get("vy", 0), ch.get("vz", 0)))
+            for ap in config.get("antennes", []) for ch in ap.get("channels", [])]
+    return np.array(rows, dtype=POSITION_DTYPE)
+
+
+def _file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def load_positions(path=POSITIONS_PATH):
+    """全部天线位置（POSITION_DTYPE，只读内存映射）；缓存缺失或过期时重新解析并写入缓存"""
+    folder = os.path.dirname(os.path.abspath(path))
+    cache_path = os.path.join(folder, CACHE_NAME)
+    meta_path = os.path.join(folder, CACHE_META_NAME)
+    stat = os.stat(path)
+    key = {"version": CACHE_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    meta = {}
+    if os.path.exists(cache_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+    if meta and all(meta.get(k) == v for k, v in key.items()):
+        return np.load(cache_path, mmap_mode="r")
+
+    # 修改时间变了但内容相同（例如重新检出）时只更新校验信息
+    digest = _file_digest(path)
+    if meta.get("version") == CACHE_VERSION and meta.get("sha1") == digest:
+        table = np.load(cache_path, mmap_mode="r")
+    else:
+        table = parse_positions(path)
+    try:
+        if not isinstance(table, np.memmap):
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, table)
+            os.replace(tmp_path, cache_path)
+            table = np.load(cache_path, mmap_mode="r")
+        with open(meta_path, "w") as f:
+            json.dump(dict(key, sha1=digest), f)
+    except OSError as e:
+        print(f"无法写入位置缓存 {cache_path}: {e}")
+    return table
+
+
+def select(tiles=None, ch=1, path=POSITIONS_PATH):
+    """属于 tiles（None 为全部）的 channel ch 记录，保持文件顺序"""
+    table = load_positions(path)
+    mask = table["ch"] == ch
+    if tiles is not None:
+        mask &= np.isin(table["tile"], np.asarray(list(tiles), dtype="U3"))
+    return table[mask]
+
+
+def lookup(tiles, ch=1, path=POSITIONS_PATH):
+    """按给定顺序查找 tiles 的 channel ch 记录（向量化），缺少的 tile 抛出 KeyError"""
+    table = select(None, ch, path)
+    tiles = np.asarray(list(tiles), dtype="U3")
+    order = np.argsort(table["tile"], kind="stable")
+    sorted_tiles = np.append(table["tile"][order], "")
+    idx = np.minimum(np.searchsorted(sorted_tiles[:-1], tiles), len(order))
+    found = sorted_tiles[idx] == tiles
+    if not np.all(found):
+        raise KeyError(f"positions.yml 中没有以下 tile: {', '.join(tiles[~found])}")
+    return table[order[idx]]
+
+
+def antenna_positions(tiles=None, ch=1, path=POSITIONS_PATH):
+    """tiles（None 为全部，按文件顺序）的天线位置 (n, 3)"""
+    return np.array(select(tiles, ch, path)["xyz"])
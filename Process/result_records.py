@@ -0,0 +1,87 @@
+import json
+import os
+import importlib.util
+
+import numpy as np
+
+# 采集文件名的解析只在 client/capture_names.py 中实现一份。按文件路径以独立的模块名加载，
+# 不把 client/ 加入 sys.path（否则之后的 import tools 会得到 client/tools.py 而不是 Process/tools.py）
+_spec = importlib.util.spec_from_file_location(
+    "client_capture_names", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "client", "capture_names.py"))
+_capture_names = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_capture_names)
+parse_capture_name = _capture_names.parse_capture_name
+
+# 每个采集一条记录，字段与 client/process_data.py 中的 RECORD_FIELDS 一一对应
+RESULT_DTYPE = np.dtype([
+    ("tile", "U3"),
+    ("kind", "U8"),
+    ("round", "i2"),
+    ("timestamp", "U15"),       # YYYYMMDD_HHMMSS，可直接按字符串排序
+    ("meas_id", "i4"),
+    ("experiment", "U14"),
+    ("file", "U64"),
+    ("circ_mean", "f8"),        # 相位差循环均值（rad）
+    ("circ_std", "f8"),         # 相位差循环标准差（rad）
+    ("linear_mean", "f8"),
+    ("freq_offset_ch0", "f8"),
+    ("freq_offset_ch1", "f8"),
+    ("avg_ampl_ch0", "f8"),
+    ("avg_ampl_ch1", "f8"),
+    ("max_i_ch0", "f8"),
+    ("max_i_ch1", "f8"),
+    ("max_q_ch0", "f8"),
+    ("max_q_ch1", "f8"),
+])
+
+
+def records_to_table(records):
+    """
+    把记录（字典）列表转换为 RESULT_DTYPE 结构化数组，
+    带 error 字段（处理失败）的记录被跳过。
+    """
+    rows = [tuple(record.get(name, "") if RESULT_DTYPE[name].kind == "U" else record.get(name, np.nan)
+                  for name in RESULT_DTYPE.names)
+            for record in records if "error" not in record]
+    return np.array(rows, dtype=RESULT_DTYPE)
+
+
+def load_jsonl(path):
+    """读取 process_data.py 生成的 *_result.jsonl，返回结构化数组"""
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return records_to_table(records)
+
+
+def load_results(path, use_cache=True):
+    """
+    读取一个设备的结果（*_result.jsonl），按时间戳排序后返回结构化数组。
+    解析结果缓存为同名的 .npy 二进制表，源文件未变化时直接读取缓存（毫秒级）。
+    """
+    cache_path = os.path.splitext(path)[0] + ".npy"
+    if use_cache and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        return np.load(cache_path)
+    table = load_jsonl(path)
+    table = table[np.argsort(table["timestamp"], kind="stable")]
+    if use_cache:
+        np.save(cache_path, table)
+    return table
+
+
+def format_text_report(table):
+    """由结构化记录生成人可读的文本报告（与 process_data.py 的文本块格式相同）"""
+    blocks = []
+    for row in table:
+        blocks.append("\n".join([
+            "Processing file: {}".format(row["file"]),
+            "File: {}".format(row["file"]),
+            "  CircMean phase diff: {:.6f}".format(row["circ_mean"]),
+            "  Linear mean phase diff: {:.6f}".format(row["linear_mean"]),
+            "  Frequency offset CH0: {:.4f}".format(row["freq_offset_ch0"]),
+            "  Frequency offset CH1: {:.4f}".format(row["freq_offset_ch1"]),
+            "  Avg amplitude: CH0 {:.6f}, CH1 {:.6f}".format(row["avg_ampl_ch0"], row["avg_ampl_ch1"]),
+            "  Max I: CH0 {:.6f}, CH1 {:.6f}".format(row["max_i_ch0"], row["max_i_ch1"]),
+            "  Max Q: CH0 {:.6f}, CH1 {:.6f}".format(row["max_q_ch0"], row["max_q_ch1"]),
+            "-" * 40,
+        ]))
+    return "\n".join(blocks) + "\n"
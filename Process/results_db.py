@@ -0,0 +1,237 @@
+"""
+本地结果数据库（SQLite）：每次采集一行，保存全部摘要统计量，
+在 (tile, round, timestamp)、(experiment, meas_id)、timestamp 上建索引，查询结果直接返回 NumPy 数组。
+
+导入来源：
+  - client/process_data.py 生成的 *_result.jsonl（推荐）或 *_result.txt；
+  - extract_data.py 生成的列式结果库 results.npz；
+  - sync-server.py 保存的 results-*.db（tile 推送的摘要）；
+  - Rx.py 的 Raw_Data/measurement_resultsRX.txt（只有每轮的相位）。
+
+    python results_db.py import Data/*_result.txt
+    python results_db.py stats --round 1
+
+同一 (tile, file) 重复导入时覆盖旧记录，可以反复运行。
+"""
+import os
+import re
+import sqlite3
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+import extract_data
+from result_records import RESULT_DTYPE, load_results
+
+DEFAULT_DB = os.path.join("Data", "results.db")
+STAT_FIELDS = [name for name in RESULT_DTYPE.names if RESULT_DTYPE[name].kind == "f"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    tile TEXT NOT NULL,
+    kind TEXT,
+    round INTEGER,
+    timestamp TEXT,
+    meas_id INTEGER,
+    experiment TEXT,
+    file TEXT NOT NULL,
+    source TEXT,
+    {stat_columns},
+    UNIQUE (tile, file)
+);
+CREATE INDEX IF NOT EXISTS idx_captures_tile ON captures (tile, round, timestamp);
+CREATE INDEX IF NOT EXISTS idx_captures_meas ON captures (experiment, meas_id);
+CREATE INDEX IF NOT EXISTS idx_captures_time ON captures (timestamp);
+""".format(stat_columns=",\n    ".join(f"{name} REAL" for name in STAT_FIELDS))
+
+# Rx.py: "2025-03-26 09:43:58.123456: RX1 Pilot phase round 1: -1.217311"
+MEASUREMENT_LOG_PATTERN = re.compile(r"^(.+?): RX\d+ Pilot phase round (\d+): ([-+0-9.eE]+|nan)\s*$")
+
+
+def load_server_db(path):
+    """读取 captures 表（sync-server.py 的 results-*.db 或本数据库），返回 RESULT_DTYPE 结构化数组"""
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT {} FROM captures".format(", ".join(RESULT_DTYPE.names))).fetchall()
+    finally:
+        conn.close()
+    return rows_to_table(rows, RESULT_DTYPE.names)
+
+
+def load_measurement_log(path, tile):
+    """
+    读取 Rx.py 的 measurement_resultsRX.txt（每轮一行相位，rad）。文件中没有 tile 与文件名，
+    tile 由调用者给出（默认取所在目录名的最后三个字符，如 rpi-A05 → A05）。
+    """
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            m = MEASUREMENT_LOG_PATTERN.match(line.strip())
+            if not m:
+                continue
+            timestamp = datetime.fromisoformat(m.group(1)).strftime("%Y%m%d_%H%M%S")
+            rows.append({"tile": tile, "kind": "pilot", "round": int(m.group(2)), "timestamp": timestamp,
+                         "meas_id": -1, "experiment": "",
+                         "file": f"measurement_resultsRX_{timestamp}_round{m.group(2)}",
+                         "circ_mean": float(m.group(3))})
+    table = np.zeros(len(rows), dtype=RESULT_DTYPE)
+    for name in STAT_FIELDS:
+        table[name] = np.nan
+    for i, row in enumerate(rows):
+        for name, value in row.items():
+            table[name][i] = value
+    return table
+
+
+def load_summaries(path, tile=None):
+    """
+    按文件类型读取采集摘要，返回 RESULT_DTYPE 结构化数组：
+    .npz（extract_data 结果库）、.jsonl、*_result.txt、.db（captures 表）、measurement_resultsRX.txt。
+    """
+    name = os.path.basename(path)
+    if name.endswith(".npz"):
+        store = extract_data.load_store(path)
+        table = np.zeros(len(store["tile"]), dtype=RESULT_DTYPE)
+        for field in RESULT_DTYPE.names:
+            table[field] = store[field]
+        return table
+    if name.endswith(".jsonl"):
+        return load_results(path)
+    if name.endswith(".db"):
+        return load_server_db(path)
+    if name.startswith("measurement_results"):
+        tile = tile or os.path.basename(os.path.dirname(os.path.abspath(path)))[-3:]
+        return load_measurement_log(path, tile)
+    if name.endswith(".txt"):
+        return extract_data.parse_result_text(path)
+    raise ValueError(f"不支持的摘要文件: {path}")
+
+
+def rows_to_table(rows, fields):
+    """SQLite 行 → 结构化数组（NULL 转为 NaN / 空字符串 / -1）"""
+    dtype = np.dtype([(name, RESULT_DTYPE[name]) for name in fields])
+    defaults = tuple("" if dtype[name].kind == "U" else (-1 if dtype[name].kind == "i" else np.nan)
+                     for name in fields)
+    return np.array([tuple(d if v is None else v for v, d in zip(row, defaults)) for row in rows], dtype=dtype)
+
+
+class ResultsDB:
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def insert_table(self, table, source=""):
+        """批量写入一张 RESULT_DTYPE 表（单个事务），返回写入行数"""
+        columns = list(RESULT_DTYPE.names) + ["source"]
+        sql = "INSERT OR REPLACE INTO captures ({}) VALUES ({})".format(
+            ", ".join(columns), ", ".join("?" * len(columns)))
+        # tolist() 把 NumPy 标量转换为 Python 类型；NaN 存为 NULL
+        values = ([None if isinstance(v, float) and v != v else v for v in row] + [source]
+                  for row in table.tolist())
+        with self.conn:
+            self.conn.executemany(sql, values)
+        return len(table)
+
+    def import_path(self, path, tile=None):
+        return self.insert_table(load_summaries(path, tile), os.path.basename(path))
+
+    def query(self, fields=None, tile=None, kind=None, round=None, experiment=None, meas_id=None,
+              start=None, end=None, order="tile, round, timestamp"):
+        """
+        按条件查询，返回结构化数组。tile/kind/round/experiment/meas_id 可为单个值或列表，
+        start/end 为时间戳范围（YYYYMMDD_HHMMSS，含 start 不含 end）。
+        """
+        fields = list(RESULT_DTYPE.names) if fields is None else list(fields)
+        where, params = [], []
+        for column, value in (("tile", tile), ("kind", kind), ("round", round),
+                              ("experiment", experiment), ("meas_id", meas_id)):
+            if value is None:
+                continue
+            values = list(np.atleast_1d(value).tolist())
+            where.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params += values
+        if start is not None:
+            where.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("timestamp < ?")
+            params.append(end)
+        sql = "SELECT {} FROM captures".format(", ".join(fields))
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if order:
+            sql += " ORDER BY " + order
+        return rows_to_table(self.conn.execute(sql, params).fetchall(), fields)
+
+    def column(self, field, **filters):
+        """单个字段的一维数组（按 tile, round, timestamp 排序）"""
+        return self.query([field], **filters)[field]
+
+    def tiles(self):
+        return np.array([row[0] for row in self.conn.execute("SELECT DISTINCT tile FROM captures ORDER BY tile")])
+
+    def per_tile_stats(self, field="circ_mean", **filters):
+        """
+        每个 tile 的记录数、均值、最小值与最大值（按索引顺序取出后用 reduceat 分组计算）。
+        circ_mean 等相位量请用 query() 取出后做循环统计，这里的均值是算术均值。
+        """
+        table = self.query(["tile", field], order="tile", **filters)
+        tiles, start, counts = np.unique(table["tile"], return_index=True, return_counts=True)
+        values = table[field]
+        dtype = np.dtype([("tile", "U3"), ("n", "i8"), ("mean", "f8"), ("min", "f8"), ("max", "f8")])
+        result = np.zeros(len(tiles), dtype=dtype)
+        result["tile"] = tiles
+        result["n"] = counts
+        if len(values):
+            result["mean"] = np.add.reduceat(np.nan_to_num(values), start) / np.maximum(
+                np.add.reduceat(~np.isnan(values), start), 1)
+            result["min"] = np.fmin.reduceat(values, start)
+            result["max"] = np.fmax.reduceat(values, start)
+        return result
+
+    def phase_matrix(self, round_no, field="circ_mean", kind="pilot"):
+        """与 extract_data.phase_matrix 相同的 NaN 填充复数矩阵（tile × 测量次数），直接由数据库查询"""
+        table = self.query(["tile", "round", "timestamp", field], kind=kind, round=round_no)
+        store = {"tile": table["tile"], "round": table["round"], field: table[field], "tiles": self.tiles()}
+        return extract_data.phase_matrix(store, round_no, field)
+
+    def close(self):
+        self.conn.close()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="本地结果数据库：导入摘要、按 tile 查询统计")
+    parser.add_argument("--db", default=DEFAULT_DB, help="数据库文件")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="导入摘要文件")
+    p_import.add_argument("paths", nargs="+")
+    p_import.add_argument("--tile", default=None, help="measurement_resultsRX.txt 对应的 tile")
+    p_stats = sub.add_parser("stats", help="每个 tile 的统计")
+    p_stats.add_argument("--field", default="circ_mean")
+    p_stats.add_argument("--round", type=int, default=None)
+    p_stats.add_argument("--experiment", default=None)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    db = ResultsDB(args.db)
+    try:
+        if args.command == "import":
+            for path in args.paths:
+                print(f"{path}: 导入 {db.import_path(path, args.tile)} 条记录")
+        else:
+            for row in db.per_tile_stats(args.field, round=args.round, experiment=args.experiment):
+                print(f"{row['tile']}: n {row['n']:6d}  mean {row['mean']:10.6f}  "
+                      f"min {row['min']:10.6f}  max {row['max']:10.6f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
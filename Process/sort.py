@@ -1,45 +1,159 @@
 import os
 import re
+import hashlib
+import argparse
 
+import numpy as np
 
-def sort_file(file_path):
-    # ... (函数内容保持不变)
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    segments = [seg.strip() for seg in content.split('----------------------------------------') if seg.strip()]
-    segments_with_ts = []
-    segments_without_ts = []
-    for seg in segments:
-        if 'Processing file:' in seg:
-            m = re.search(r'round\d+_(\d{8}_\d{6})', seg)
-            if m:
-                timestamp = m.group(1)
-                segments_with_ts.append((timestamp, seg))
-            else:
-                segments_without_ts.append(seg)
-        else:
-            segments_without_ts.append(seg)
-    segments_with_ts.sort(key=lambda x: x[0])
-    sorted_segments = [seg for ts, seg in segments_with_ts] + segments_without_ts
-    new_content = "\n----------------------------------------\n".join(sorted_segments) + "\n"
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(new_content)
-    print(f"{file_path} 已排序并覆盖原数据。")
+SEPARATOR = b"-" * 40
+INDEX_SUFFIX = ".idx.npz"
+HEAD_BYTES = 4096           # 用文件开头的哈希判断结果文件是否被整体替换（追加不会改变开头）
 
+# 索引项：数据段在文件中的字节偏移、长度（不含分隔线）和时间戳（无时间戳为空，排在最后）
+INDEX_DTYPE = np.dtype([("offset", "i8"), ("length", "i4"), ("timestamp", "S15")])
+TIMESTAMP_PATTERN = re.compile(rb"round\d+_(\d{8}_\d{6})")
 
-def main():
-    # 修改这里，设置 data_folder 为正确的路径。假设 Data 文件夹在脚本上一级目录中
+
+def index_path(file_path):
+    return file_path + INDEX_SUFFIX
+
+
+def head_digest(file_path, n_bytes):
+    with open(file_path, "rb") as f:
+        return hashlib.sha1(f.read(min(n_bytes, HEAD_BYTES))).hexdigest()
+
+
+def sort_key(timestamps):
+    """排序键：无时间戳的数据段放在最后（与旧版 sort_file 的输出顺序一致）"""
+    return np.where(timestamps == b"", b"~", timestamps)
+
+
+def scan_segments(file_path, start):
+    """
+    从字节偏移 start 开始扫描结果文件，返回 (新数据段索引, 已完整索引到的字节位置)。
+    数据段以分隔线结束；"Error processing" 段后面没有分隔线，遇到下一个
+    "Processing file:" 行时同样结束。文件末尾没有分隔线的最后一段也被索引，
+    但已索引位置停在它的开头，下次更新时重新扫描（它可能还在被追加）。
+    """
+    entries = []
+    seg_start = None
+    timestamp = b""
+    indexed = start
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        pos = start
+        for line in f:
+            stripped = line.strip()
+            if stripped.startswith(b"Processing file:") and seg_start is not None:
+                entries.append((seg_start, pos - seg_start, timestamp))
+                seg_start, timestamp = None, b""
+                indexed = pos
+            if stripped == SEPARATOR:
+                if seg_start is not None:
+                    entries.append((seg_start, pos - seg_start, timestamp))
+                seg_start, timestamp = None, b""
+                indexed = pos + len(line)
+            elif stripped:
+                if seg_start is None:
+                    seg_start = pos
+                if not timestamp and stripped.startswith(b"Processing file:"):
+                    m = TIMESTAMP_PATTERN.search(stripped)
+                    if m:
+                        timestamp = m.group(1)
+            pos += len(line)
+    if seg_start is not None:
+        entries.append((seg_start, pos - seg_start, timestamp))
+    return np.array(entries, dtype=INDEX_DTYPE), indexed
+
+
+def load_index(file_path):
+    """读取侧车索引；不存在或结果文件已被替换/截断时返回空索引"""
+    path = index_path(file_path)
+    empty = np.zeros(0, dtype=INDEX_DTYPE), 0
+    if not os.path.exists(path):
+        return empty
+    with np.load(path) as data:
+        entries, indexed = data["entries"], int(data["indexed_bytes"])
+        digest = str(data["head_digest"])
+    if os.path.getsize(file_path) < indexed or head_digest(file_path, indexed) != digest:
+        return empty
+    return entries, indexed
+
+
+def save_index(file_path, entries, indexed):
+    path = index_path(file_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, entries=entries, indexed_bytes=np.int64(indexed),
+                 head_digest=np.array(head_digest(file_path, indexed)))
+    os.replace(tmp_path, path)
+
+
+def update_index(file_path):
+    """
+    增量更新一个结果文件的时间戳索引：只扫描上次索引位置之后追加的内容，
+    新数据段排序后归并进已有的有序索引，结果文件本身不被改写。
+    返回 (索引, 新增数据段数)。
+    """
+    entries, indexed = load_index(file_path)
+    if indexed == os.path.getsize(file_path):
+        return entries, 0
+    new_entries, new_indexed = scan_segments(file_path, indexed)
+    # 上次末尾没有分隔线的段已在索引中，重新扫描后替换它
+    tail = entries["offset"] >= indexed
+    if new_indexed == indexed and np.array_equal(np.sort(entries[tail]), np.sort(new_entries)):
+        return entries, 0
+    added = len(new_entries) - int(tail.sum())
+    entries, indexed = entries[~tail], new_indexed
+    if len(new_entries):
+        new_entries = new_entries[np.argsort(sort_key(new_entries["timestamp"]), kind="stable")]
+        # 归并：新段插入到已有索引中时间戳相同的段之后，保持追加顺序
+        at = np.searchsorted(sort_key(entries["timestamp"]), sort_key(new_entries["timestamp"]), side="right")
+        entries = np.insert(entries, at, new_entries)
+    save_index(file_path, entries, indexed)
+    return entries, added
+
+
+def iter_sorted_segments(file_path):
+    """按时间戳顺序逐段读取结果文件（先增量更新索引），每次只读一个数据段"""
+    entries, _ = update_index(file_path)
+    with open(file_path, "rb") as f:
+        for offset, length, _ in entries:
+            f.seek(offset)
+            yield f.read(length).decode("utf-8").strip()
+
+
+def export_sorted(file_path, out_path):
+    """把按时间戳排序的内容写到另一个文件（与旧版 sort_file 的输出格式相同），原文件保持不变"""
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write("\n----------------------------------------\n".join(iter_sorted_segments(file_path)) + "\n")
+
+
+def parse_arguments():
+    # 默认目录与旧版一致：假设 Data 文件夹在脚本上一级目录中
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    data_folder = os.path.join(script_dir, "..", "Data")  # 根据实际情况调整
+    parser = argparse.ArgumentParser(description="为 *_result.txt 建立/增量更新按时间戳排序的侧车索引")
+    parser.add_argument("--data", default=os.path.join(script_dir, "..", "Data"), help="结果文件目录")
+    parser.add_argument("--export", default=None, help="把排序后的结果另存到该目录（不改写原文件）")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    data_folder = args.data
 
     if not os.path.exists(data_folder):
         print(f"错误：目录 {data_folder} 不存在。")
         return
 
-    for file_name in os.listdir(data_folder):
+    for file_name in sorted(os.listdir(data_folder)):
         if file_name.endswith("_result.txt"):
             file_path = os.path.join(data_folder, file_name)
-            sort_file(file_path)
+            entries, added = update_index(file_path)
+            print(f"{file_path}: 索引 {len(entries)} 段，新增 {added} 段。")
+            if args.export:
+                os.makedirs(args.export, exist_ok=True)
+                export_sorted(file_path, os.path.join(args.export, file_name))
 
 
 if __name__ == "__main__":
@@ -4,6 +4,8 @@ import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D  # 3D绘图必备
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 
+import positions
+
 def get_ceiling_devices(inventory_path):
     """
     从 inventory.yaml 中读取属于 ceiling 组的设备ID，
@@ -17,26 +19,13 @@ def get_ceiling_devices(inventory_path):
 
 def get_ceiling_ap_positions(positions_path, ceiling_devices):
     """
-    从 positions.yml 的 'antennes' 中读取天花板 AP 位置信息。
+    从 positions.yml 的 'antennes' 中读取天花板 AP 位置信息（经 positions.py 的二进制缓存）。
     仅包含 tile 在 ceiling_devices 中且 ch == 0 的项。
     返回 [{'tile', 'x', 'y', 'z'}, ...]。
     """
-    with open(positions_path, 'r') as f:
-        data = yaml.safe_load(f)
-    positions = []
-    for ap in data.get("antennes", []):
-        tile_name = str(ap.get("tile"))
-        if tile_name in ceiling_devices:
-            for ch in ap.get("channels", []):
-                if ch.get("ch") == 0:
-                    positions.append({
-                        "tile": tile_name,
-                        "x": ch.get("x"),
-                        "y": ch.get("y"),
-                        "z": ch.get("z")
-                    })
-                    break
-    return positions
+    table = positions.select(ceiling_devices, ch=0, path=positions_path)
+    return [{"tile": str(row["tile"]), "x": row["xyz"][0], "y": row["xyz"][1], "z": row["xyz"][2]}
+            for row in table]
 
 def plot_cylinder(ax, center=(0,0), z_bottom=0.0, z_top=1.0, radius=0.1,
                   color='goldenrod', alpha=0.7, resolution=20):
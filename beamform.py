@@ -1,25 +1,35 @@
+import os
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
-from matplotlib.animation import FuncAnimation
 import numpy as np
 import matplotlib.pyplot as plt
-import requests
-import yaml
 from matplotlib.patches import Rectangle
 from mpl_toolkits.mplot3d import Axes3D  # Import 3D plotting toolkit
+from numpy.lib.format import open_memmap
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Process"))
+import field_engine
+import frame_render
+import positions
 
 
 # Specify the relative path to ffmpeg.exe (same folder as the script)
 ffmpeg_path = "./ffmpeg.exe"
-plt.rcParams["animation.ffmpeg_path"] = ffmpeg_path
 
 #################### CONFIGURATIONS ####################
 PLOT_ONLY_XY_PLANE = False
 PLOT_ONLE_ACTIVE_TILES = False
+# Replay measured per-tile phase snapshots (tiles x snapshots, NaN-padded) instead of random phases,
+# e.g. "Process/round1_phase_data.npy"; rows follow the `tiles` of the results store it was exported from
+REPLAY_PHASE_DATA = None
+REPLAY_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Process", "Data", "results.npz")
 ########################################################
 
-positions_url = r"https://raw.githubusercontent.com/techtile-by-dramco/plotter/refs/heads/main/src/TechtilePlotter/positions.yml"
+# Antenna positions come from the local Process/positions.yml (same file as the TechtilePlotter
+# repository), read through the binary cache in Process/positions.py -- no network access needed.
 
 active_tiles = [
     "A05", "A06", "A07", "A08", "A09", "A10",
@@ -34,18 +44,7 @@ active_tiles = [
 #     "G05", "G07", "G08"
 # ]
 
-# Retrieve the file content from the URL
-response = requests.get(positions_url, allow_redirects=True)
-content = response.content.decode("utf-8")
-config = yaml.safe_load(content)
-antenna_positions = []
-
-for c in config["antennes"]:
-    if c["tile"] in active_tiles or not PLOT_ONLE_ACTIVE_TILES:
-        ch = c["channels"][1]
-        antenna_positions.append([ch["x"], ch["y"], ch["z"]])
-
-antenna_positions = np.asarray(antenna_positions)
+antenna_positions = positions.antenna_positions(active_tiles if PLOT_ONLE_ACTIVE_TILES else None, ch=1)
 
 
 # Constants
@@ -73,63 +72,64 @@ L = len(antenna_positions)  # Number of antennas
 # Define grid for mesh
 xv_ = np.arange(X_MIN, X_MAX + dx, dx)
 yv_ = np.arange(Y_MIN, Y_MAX + dy, dy)
-x_mesh, y_mesh = np.meshgrid(xv_, yv_)
-z_mesh = np.zeros_like(x_mesh) + 0.5
+Z_PLANE = 0.5  # height of the evaluated plane (m)
 
-# Create a figure for 3D plot
-fig = plt.figure(figsize=(10, 7))
-ax = fig.add_subplot(111, projection='3d')
+# Grid x L channel matrix of the plane, cached on disk (Process/.field_cache) and shared across runs
+field = field_engine.PlaneField(xv_, yv_, Z_PLANE, antenna_positions, lambda_)
 
-# Function to update each frame with new random phase
-def update_frame(frame_number):
-    ax.clear()  # Clear the plot for the next frame
+RENDER_MODE = "surface"  # "surface" (3D, as before) or "heatmap" (2D, much faster)
+RENDER_WORKERS = None    # processes used for rasterizing frames (None: all cores)
 
-    # Random phase between 0 and 2π
-    random_phase = np.random.uniform(0, 2 * np.pi, L)
-    
-    # True channel vector with random phase
-    h = np.exp(1j * random_phase)
 
-    # MRT weights
-    w = np.conj(h) 
-    
-    # Initialize y for path gain values
-    y = np.zeros(x_mesh.shape, dtype=complex)
+def replay():
+    """MRT fields of the measured phase snapshots, streamed block by block into a (snapshots, ny, nx) memmap"""
+    # extract_data.phase_matrix writes one row per store["tiles"] entry, in that order
+    with np.load(REPLAY_STORE) as store:
+        tiles = store["tiles"]
+    phase_data = np.load(REPLAY_PHASE_DATA, mmap_mode="r")
+    if phase_data.shape[0] != len(tiles):
+        raise ValueError(f"{REPLAY_PHASE_DATA} has {phase_data.shape[0]} rows but {REPLAY_STORE} lists {len(tiles)} tiles")
+
+    # positions.lookup raises KeyError for any store tile without a position
+    replay_field = field_engine.PlaneField(xv_, yv_, Z_PLANE, positions.lookup(tiles, ch=1)["xyz"], lambda_)
+    frames = open_memmap("measured_path_gain.npy", mode="w+", dtype=np.complex64,
+                         shape=(phase_data.shape[1],) + replay_field.shape)
+    for i, frame in enumerate(field_engine.replay_frames(replay_field, phase_data)):
+        frames[i] = frame
+    frames.flush()
+    del frames
 
-    # Compute path gain for each grid point
-    for gg in range(x_mesh.size):
-        pg = np.array([x_mesh.flat[gg], y_mesh.flat[gg], z_mesh.flat[gg]])
-        rag = np.tile(pg.reshape(3, 1), (1, L)) - antenna_positions.T  # Vector distances from array to grid point
-        dag = np.linalg.norm(rag, axis=0)  # Scalar distances (L x 1)
+    timings = frame_render.render("measured_path_gain.npy", "measured_path_gain.mp4", mode=RENDER_MODE,
+                                  xv=xv_, yv=yv_, vmin=-30, vmax=0, fps=10, workers=RENDER_WORKERS,
+                                  title="Snapshot {frame}", ffmpeg=ffmpeg_path)
+    frame_render.print_timings(timings, RENDER_WORKERS)
 
-        # Channel vector at grid point
-        hg = lambda_ / (4 * np.pi * dag) * np.exp(-1j * 2 * np.pi / lambda_ * dag)
 
-        # Path gain at grid point
-        y.flat[gg] = np.dot(w.T, hg)
-    
-    # Compute the path gain in dB
-    PG_dB = 10 * np.log10(np.abs(y) ** 2)
+def main():
+    if REPLAY_PHASE_DATA:
+        replay()
+        return
 
-    # Plot the surface
-    surf = ax.plot_surface(x_mesh, y_mesh, PG_dB, vmin=-30, vmax=0, cmap='viridis')
-    ax.set_zlim(-30,0)
+    # Random phase between 0 and 2π for every frame
+    random_phase = np.random.uniform(0, 2 * np.pi, (num_frames, L))
 
+    # True channel vectors with random phase
+    h = np.exp(1j * random_phase)
 
-    # Set labels and title
-    ax.set_xlabel('X in m')
-    ax.set_ylabel('Y in m')
-    ax.set_zlabel('Path Gain (PG) in dB')
-    ax.set_title(f'Frame {frame_number + 1}')
+    # MRT weights (frames x L)
+    W = np.conj(h)
 
-    # Add colorbar (for first frame only to avoid overlap)
-    # if frame_number == 0:
-    #     fig.colorbar(surf)
+    # Path gain at every grid point for all frames: hg = lambda/(4 pi d) exp(-j 2 pi d / lambda), y = hg . w
+    # (one blocked matrix product with the cached channel matrix, written to a (frames, ny, nx) memmap)
+    field.evaluate_frames(W, path="random_phase_path_gain.npy")
 
-# Create an animation
-anim = FuncAnimation(fig, update_frame, frames=num_frames, interval=1)
+    # Rasterize the frames in a process pool and pipe them straight into ffmpeg
+    timings = frame_render.render("random_phase_path_gain.npy", "random_phase_path_gain.mp4", mode=RENDER_MODE,
+                                  xv=xv_, yv=yv_, vmin=-30, vmax=0, fps=10, workers=RENDER_WORKERS,
+                                  ffmpeg=ffmpeg_path)
+    frame_render.print_timings(timings, RENDER_WORKERS)
 
-# Save the animation as an MP4 file
-anim.save('random_phase_path_gain.mp4', writer='ffmpeg', fps=10)
 
-plt.close(fig)
+# Guarded so the rendering worker processes can re-import this module on Windows (spawn)
+if __name__ == "__main__":
+    main()
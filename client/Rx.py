@@ -15,6 +15,7 @@ import yaml
 import zmq
 import queue
 import tools
+import result_push
 
 CMD_DELAY = 0.05               # Command delay
 RX_TX_SAME_CHANNEL = True      # Loopback flag for same TX/RX channel
@@ -31,6 +32,8 @@ results = []
 
 SWITCH_LOOPBACK_MODE = 0x00000006
 SWITCH_RESET_MODE = 0x00000000
+PUSH_RESULTS = True            # Push capture summaries to the sync server (port 5559)
+PUSH_PHASE_DECIMATION = 0      # >0: also push the phase-difference trace, decimated by this factor
 
 # Initialize ZMQ (though this RX script mainly captures, keep this part)
 context = zmq.Context()
@@ -40,6 +43,7 @@ iq_socket.bind(f"tcp://*:{50001}")
 HOSTNAME = socket.gethostname()[4:]
 file_open = False
 server_ip = None  # RX end does not depend on server; server IP will be set during sync stage
+push_server_ip = None  # set once the sync server is known
 
 # Read configurations from cal-settings.yml (if any)
 with open(os.path.join(os.path.dirname(__file__), "cal-settings.yml"), "r") as file:
@@ -147,6 +151,12 @@ def rx_ref(usrp, rx_streamer, quit_event, duration, result_queue, start_time=Non
         logger.debug("MAX AMPL IQ CH0: I %.6f Q %.6f CH1: I %.6f Q %.6f", max_I[0], max_Q[0], max_I[1], max_Q[1])
         logger.debug("AVG AMPL IQ CH0: %.6f CH1: %.6f", avg_ampl[0], avg_ampl[1])
 
+        if PUSH_RESULTS and push_server_ip:
+            # get_phases_and_apply_bandpass 不估计频偏（返回的斜率恒为 0），所以不传 freq_offset，记为 NULL
+            summary = tools.capture_summary(iq_samples, phase_diff, _circ_mean, _mean, avg_ampl, max_I, max_Q)
+            result_push.push_in_background(push_server_ip, HOSTNAME, file_name_state, summary,
+                                           phase_diff, PUSH_PHASE_DECIMATION, logger=logger)
+
 def rx_thread(usrp, rx_streamer, quit_event, duration, res, start_time=None):
     _rx_thread = threading.Thread(
         target=rx_ref,
@@ -282,7 +292,7 @@ def setup(usrp, server_ip, connect=False):
 # Main
 # ---------------------------
 def main():
-    global file_name_state, file_name
+    global file_name_state, file_name, push_server_ip
     save_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "Raw_Data"))
     if not os.path.exists(save_dir):
         os.makedirs(save_dir)
@@ -304,6 +314,7 @@ def main():
         # =========================
         # Replace with your actual sync server IP
         sync_server_ip = "192.108.1.147"
+        push_server_ip = sync_server_ip
         sync_context = zmq.Context()
         # Create REQ socket for 'alive' signal (port 5558)
         alive_client = sync_context.socket(zmq.REQ)
@@ -0,0 +1,36 @@
+"""
+Capture file names written by Rx.py and usrp-cal-bf.py, shared by the client scripts
+and Process/ (result_records.py imports this module), so it only depends on the stdlib.
+"""
+import os
+import re
+
+
+CAPTURE_NAME_PATTERNS = [
+    # Rx.py: data_offline_A05_pilot_round1_20250326_094348.npy
+    re.compile(r"data_offline_(?P<tile>[A-Z]\d{2})_(?P<kind>pilot|loopback)"
+               r"_round(?P<round>\d+)_(?P<timestamp>\d{8}_\d{6})"),
+    # usrp-cal-bf.py: data_A05_20241108144903_1_pilot.npy
+    re.compile(r"data_(?P<tile>[A-Z]\d{2})_(?P<experiment>\d{14})_(?P<meas_id>\d+)_(?P<kind>pilot|loopback)"),
+]
+
+
+def parse_capture_name(file_name):
+    """Extract tile, kind, round, timestamp, meas_id and experiment from a capture file name.
+
+    Fields that are not encoded in the name keep their defaults ("" / 0 / -1).
+    """
+    info = {"tile": "", "kind": "", "round": 0, "timestamp": "", "meas_id": -1, "experiment": ""}
+    base = os.path.basename(file_name)
+    for pattern in CAPTURE_NAME_PATTERNS:
+        m = pattern.search(base)
+        if m:
+            for key, value in m.groupdict().items():
+                info[key] = int(value) if key in ("round", "meas_id") else value
+            break
+    else:
+        if "loopback" in base:
+            info["kind"] = "loopback"
+        elif "pilot" in base:
+            info["kind"] = "pilot"
+    return info
@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+"""
+增量式原始数据收集：
+  - 在每个 tile 上生成 Raw_Data 的 manifest（文件名、大小、mtime、内容哈希），
+    哈希结果缓存在 tile 上，只有大小或 mtime 变化的文件才重新计算；
+  - 与 VM 本地的 manifest 比较，只传输新增或已变化的采集文件；
+  - 多个 tile 并发收集，总带宽按并发数平均分配；
+  - 复制完成后在本地重新计算哈希进行校验，可选地删除 tile 上已安全收集的文件。
+
+传输方式（--transfer）：
+  - scp：每个文件一个 scp 源参数，按批次复制；
+  - stream：在 tile 上把待传文件打包成一个 tar 流，经 zstd 压缩后通过一条 SSH 连接传输，
+    VM 端边接收边解压、边解包。加 --sc16 时，complex64 采集在 tile 上先转换为 sc16
+    （USRP 的线上格式，见 StreamArgs("fc32", "sc16")），只有在能无损还原时才转换，
+    否则原样发送，因此 VM 端还原出的文件与原文件逐字节一致，仍可用哈希校验。
+
+用法示例：
+    python3 collect_data.py --dest /media/sf_Shared/Data --jobs 8 --bwlimit 80
+    python3 collect_data.py --transfer stream --sc16
+    python3 collect_data.py --prune   # 校验通过后删除 tile 上的文件
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+import numpy as np
+import yaml
+
+REMOTE_USER = "pi"
+INVENTORY_PATH = "inventory.yaml"
+# 远程数据目录（在远程设备上存放 .npy 文件的目录）
+REMOTE_DATA_DIR = "~/Techtile_Channel_Measurement/Raw_Data"
+# 本地（VM）数据目录，每个 tile 一个子目录
+DEST_BASE_DIR = "/media/sf_Shared/Data"
+# tile 上与本地的 manifest 文件名
+MANIFEST_NAME = ".manifest.json"
+# 每条 scp 命令最多携带的文件数，避免命令行过长
+SCP_BATCH = 100
+HASH_CHUNK = 1 << 20
+
+# 在 tile 上执行的脚本：遍历 Raw_Data，复用缓存的哈希，输出 JSON 格式的 manifest
+REMOTE_MANIFEST_SCRIPT = r'''
+import hashlib, json, os, sys
+
+raw_data_dir = os.path.expanduser(sys.argv[1])
+manifest_path = os.path.join(raw_data_dir, sys.argv[2])
+
+try:
+    with open(manifest_path, "r") as f:
+        cached = json.load(f)
+except (OSError, ValueError):
+    cached = {}
+
+manifest = {}
+for entry in os.scandir(raw_data_dir):
+    if not entry.is_file() or entry.name.startswith("."):
+        continue
+    st = entry.stat()
+    old = cached.get(entry.name)
+    if old and old["size"] == st.st_size and old["mtime"] == st.st_mtime:
+        manifest[entry.name] = old
+        continue
+    h = hashlib.sha256()
+    with open(entry.path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    manifest[entry.name] = {"size": st.st_size, "mtime": st.st_mtime, "sha256": h.hexdigest()}
+
+tmp_path = manifest_path + ".tmp"
+with open(tmp_path, "w") as f:
+    json.dump(manifest, f)
+os.replace(tmp_path, manifest_path)
+json.dump(manifest, sys.stdout)
+'''
+
+
+# sc16 转换（tile 端执行；本地也会加载同一段代码做往返检查，见 check_sc16_roundtrip）
+SC16_SCRIPT = r'''
+SC16_SCALES = {"div32767": 32767.0, "div32768": 32768.0}
+
+
+def to_sc16(data):
+    """返回 (sc16 数组, 还原方式)，无法无损还原时返回 None"""
+    import numpy as np
+    if data.dtype != np.complex64:
+        return None
+    iq = np.empty(data.shape + (2,), dtype=np.int16)
+    for mode, scale in SC16_SCALES.items():
+        re_ = np.round(data.real * scale)
+        im_ = np.round(data.imag * scale)
+        if re_.min(initial=0) < -32768 or re_.max(initial=0) > 32767 \
+                or im_.min(initial=0) < -32768 or im_.max(initial=0) > 32767:
+            continue
+        iq[..., 0] = re_
+        iq[..., 1] = im_
+        restored = np.empty(data.shape, dtype=np.complex64)
+        # 与 UHD 的 sc16 → fc32 转换相同：乘以 float32(1/scale)，而不是除以 scale
+        restored.real = iq[..., 0].astype(np.float32) * np.float32(1 / scale)
+        restored.imag = iq[..., 1].astype(np.float32) * np.float32(1 / scale)
+        if np.array_equal(restored.view(np.uint32), data.view(np.uint32)):
+            return iq, mode
+    return None
+'''
+
+# 在 tile 上执行的打包脚本（前面会拼接 NAMES / RAW_DATA_DIR / SC16 / LEVEL 的定义）：
+# tar 流写入 zstd 的 stdin，zstd 的输出直接写到 SSH 的 stdout
+REMOTE_STREAM_SCRIPT = r'''
+import io, os, subprocess, sys, tarfile
+''' + SC16_SCRIPT + r'''
+
+raw_data_dir = os.path.expanduser(RAW_DATA_DIR)
+zstd = subprocess.Popen(["zstd", "-q", "-c", "-T0", "-%d" % LEVEL], stdin=subprocess.PIPE, stdout=sys.stdout.buffer)
+with tarfile.open(fileobj=zstd.stdin, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+    for name in NAMES:
+        path = os.path.join(raw_data_dir, name)
+        if SC16 and name.endswith(".npy"):
+            import numpy as np
+            with open(path, "rb") as f:
+                # 原始 .npy 头部原样带给 VM，保证还原后的文件逐字节一致
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    np.lib.format.read_array_header_1_0(f)
+                else:
+                    np.lib.format.read_array_header_2_0(f)
+                header_len = f.tell()
+                f.seek(0)
+                npy_header = f.read(header_len)
+            converted = to_sc16(np.load(path))
+            if converted is not None:
+                iq, mode = converted
+                buf = io.BytesIO()
+                np.save(buf, iq)
+                info = tarfile.TarInfo(name[:-len(".npy")] + ".sc16.npy")
+                info.size = buf.tell()
+                info.mtime = os.path.getmtime(path)
+                info.pax_headers = {"techtile.sc16": mode, "techtile.name": name,
+                                    "techtile.npyheader": npy_header.hex()}
+                buf.seek(0)
+                tar.addfile(info, buf)
+                continue
+        tar.add(path, arcname=name)
+zstd.stdin.close()
+sys.exit(zstd.wait())
+'''
+
+_sc16 = {}
+exec(SC16_SCRIPT, _sc16)
+SC16_SCALES = _sc16["SC16_SCALES"]
+to_sc16 = _sc16["to_sc16"]
+
+
+def get_ceiling_hosts(inventory_path):
+    """
+    从 YAML 格式的 inventory 文件中提取 ceiling 组下的所有主机，
+    返回字典，键为主机 key（如 G09），值为实际连接使用的地址（ansible_host）。
+    """
+    with open(inventory_path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+
+    ceiling_keys = list(data["all"]["children"]["ceiling"]["hosts"].keys())
+    all_hosts = data["all"]["hosts"]
+    hosts_info = {}
+    for key in ceiling_keys:
+        hosts_info[key] = all_hosts.get(key, {}).get("ansible_host", key)
+    return hosts_info
+
+
+def file_sha256(path):
+    """计算本地文件的 SHA-256（分块读取，避免把大文件整体读入内存）"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(path):
+    """读取 manifest，不存在或损坏时返回空字典"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    """原子地写入 manifest（先写临时文件再替换），中断时不会留下半个文件"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def get_remote_manifest(remote_host, remote_user=REMOTE_USER, remote_dir=REMOTE_DATA_DIR):
+    """
+    通过 SSH 在 tile 上执行 REMOTE_MANIFEST_SCRIPT，返回 {文件名: {size, mtime, sha256}}。
+    失败时返回 None。
+    """
+    cmd = ["ssh", f"{remote_user}@{remote_host}", "python3", "-", remote_dir, MANIFEST_NAME]
+    result = subprocess.run(cmd, input=REMOTE_MANIFEST_SCRIPT, text=True, capture_output=True)
+    if result.returncode != 0:
+        print(f"[{remote_host}] 获取 manifest 失败:\n{result.stderr.strip()}")
+        return None
+    return json.loads(result.stdout)
+
+
+def diff_manifest(remote_manifest, local_manifest):
+    """返回需要传输的文件名列表：本地不存在、未校验通过，或大小/哈希与远程不一致"""
+    pending = []
+    for name, entry in remote_manifest.items():
+        local = local_manifest.get(name)
+        if (local is None or not local.get("verified")
+                or local["size"] != entry["size"] or local["sha256"] != entry["sha256"]):
+            pending.append(name)
+    return sorted(pending)
+
+
+def scp_files(remote_host, names, dest_dir, bwlimit_kbit=None,
+              remote_user=REMOTE_USER, remote_dir=REMOTE_DATA_DIR):
+    """
+    分批用 scp 把 names 中的文件复制到 dest_dir。
+    bwlimit_kbit 为单个 scp 进程的带宽上限（Kbit/s），None 表示不限速。
+    返回 True 表示所有批次都成功。
+    """
+    ok = True
+    for i in range(0, len(names), SCP_BATCH):
+        batch = names[i:i + SCP_BATCH]
+        cmd = ["scp", "-q", "-p"]
+        if bwlimit_kbit:
+            cmd += ["-l", str(int(bwlimit_kbit))]
+        cmd += [f"{remote_user}@{remote_host}:{remote_dir}/{name}" for name in batch]
+        cmd.append(dest_dir)
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"[{remote_host}] scp 失败:\n{result.stderr.strip()}")
+            ok = False
+    return ok
+
+
+def from_sc16(iq, mode):
+    """把 tile 端转换的 sc16 数组还原为 complex64（与 tile 端的无损检查使用相同的运算）"""
+    scale = np.float32(1 / SC16_SCALES[mode])
+    data = np.empty(iq.shape[:-1], dtype=np.complex64)
+    data.real = iq[..., 0].astype(np.float32) * scale
+    data.imag = iq[..., 1].astype(np.float32) * scale
+    return data
+
+
+def check_sc16_roundtrip():
+    """
+    用 UHD 方式生成的 fc32 数据（int16 · float32(1/32767)，覆盖全部 65536 个码值）检查 sc16 往返：
+    必须走 sc16 路径（to_sc16 不返回 None），且 from_sc16 还原后逐位一致。返回 True/False。
+    """
+    codes = np.arange(-32768, 32768, dtype=np.int32).astype(np.int16)
+    uhd = np.empty((2, len(codes)), dtype=np.complex64)
+    uhd.real = codes.astype(np.float32) * np.float32(1 / 32767)
+    uhd.imag = codes[::-1].astype(np.float32) * np.float32(1 / 32767)
+    converted = to_sc16(uhd)
+    if converted is None:
+        print("sc16 检查失败：UHD 格式的数据没有走 sc16 路径")
+        return False
+    iq, mode = converted
+    restored = from_sc16(iq, mode)
+    if mode != "div32767" or not np.array_equal(restored.view(np.uint32), uhd.view(np.uint32)):
+        print(f"sc16 检查失败：还原结果与原数据不一致（{mode}）")
+        return False
+    print("sc16 往返检查通过（65536 个码值，div32767）")
+    return True
+
+
+def _npy_fortran_order(npy_header):
+    """解析 .npy 头部中的 fortran_order"""
+    f = io.BytesIO(npy_header)
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        _, fortran_order, _ = np.lib.format.read_array_header_1_0(f)
+    else:
+        _, fortran_order, _ = np.lib.format.read_array_header_2_0(f)
+    return fortran_order
+
+
+def _pump(src, dst, counter, bwlimit_kbit=None):
+    """把 SSH 的输出转发给本地 zstd 解压进程，同时统计线上字节数并按 bwlimit 限速"""
+    started = time.time()
+    try:
+        for chunk in iter(lambda: src.read1(HASH_CHUNK), b""):
+            counter[0] += len(chunk)
+            dst.write(chunk)
+            if bwlimit_kbit:
+                # 读得太快时暂停，TCP 的背压会让 tile 端同样放慢
+                ahead = counter[0] * 8 / (bwlimit_kbit * 1000.0) - (time.time() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+    except (BrokenPipeError, ValueError):
+        # 解包出错时 stream_files 会结束 unzstd，这里随之停止
+        pass
+    finally:
+        try:
+            dst.close()
+        except BrokenPipeError:
+            pass
+
+
+def stream_files(remote_host, names, dest_dir, bwlimit_kbit=None, sc16=False, level=3,
+                 remote_user=REMOTE_USER, remote_dir=REMOTE_DATA_DIR):
+    """
+    通过一条 SSH 连接以 tar + zstd 流的方式传输 names 中的文件，边接收边解包到 dest_dir。
+    返回统计信息 {files, raw_bytes, wire_bytes, seconds, ok}，raw_bytes 为解包后的文件大小总和。
+    """
+    script = "NAMES = {!r}\nRAW_DATA_DIR = {!r}\nSC16 = {!r}\nLEVEL = {:d}\n".format(
+        list(names), remote_dir, bool(sc16), int(level)) + REMOTE_STREAM_SCRIPT
+    started = time.time()
+    # stderr 写入临时文件而不是管道：远程输出大量错误信息时不会因管道写满而卡住传输
+    ssh_stderr = tempfile.TemporaryFile()
+    ssh = subprocess.Popen(["ssh", f"{remote_user}@{remote_host}", "python3", "-"],
+                           stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=ssh_stderr)
+    unzstd = subprocess.Popen(["zstd", "-q", "-d", "-c"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    ssh.stdin.write(script.encode("utf-8"))
+    ssh.stdin.close()
+
+    wire_bytes = [0]
+    pump = threading.Thread(target=_pump, args=(ssh.stdout, unzstd.stdin, wire_bytes, bwlimit_kbit), daemon=True)
+    pump.start()
+
+    files = 0
+    raw_bytes = 0
+    ok = True
+    finished = False
+    try:
+        with tarfile.open(fileobj=unzstd.stdout, mode="r|") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                src = tar.extractfile(member)
+                mode = member.pax_headers.get("techtile.sc16")
+                name = member.pax_headers.get("techtile.name", member.name) if mode else member.name
+                name = os.path.basename(name)
+                path = os.path.join(dest_dir, name)
+                tmp_path = path + ".part"
+                if mode:
+                    data = from_sc16(np.load(io.BytesIO(src.read())), mode)
+                    npy_header = bytes.fromhex(member.pax_headers["techtile.npyheader"])
+                    fortran_order = _npy_fortran_order(npy_header)
+                    with open(tmp_path, "wb") as f:
+                        f.write(npy_header)
+                        f.write(data.tobytes(order="F" if fortran_order else "C"))
+                else:
+                    with open(tmp_path, "wb") as f:
+                        for chunk in iter(lambda: src.read(HASH_CHUNK), b""):
+                            f.write(chunk)
+                os.replace(tmp_path, path)
+                os.utime(path, (member.mtime, member.mtime))
+                files += 1
+                raw_bytes += os.path.getsize(path)
+        # 读完 tar 结束标记之后的填充，让 unzstd 与 _pump 正常结束
+        for _ in iter(lambda: unzstd.stdout.read(HASH_CHUNK), b""):
+            pass
+        finished = True
+    except tarfile.TarError as e:
+        print(f"[{remote_host}] 解包失败: {e}")
+        ok = False
+    finally:
+        if not finished:
+            # 出错后不再有人读取 unzstd 的输出：先结束两个进程，_pump 的读写才会返回
+            for proc in (ssh, unzstd):
+                if proc.poll() is None:
+                    proc.kill()
+        pump.join()
+        unzstd.stdout.close()
+        unzstd.wait()
+        ssh.wait()
+    if finished and ssh.returncode != 0:
+        ssh_stderr.seek(0)
+        print(f"[{remote_host}] 远程打包失败:\n{ssh_stderr.read().decode(errors='replace').strip()}")
+        ok = False
+    ssh_stderr.close()
+    return {"files": files, "raw_bytes": raw_bytes, "wire_bytes": wire_bytes[0],
+            "seconds": time.time() - started, "ok": ok}
+
+
+def verify_files(names, remote_manifest, dest_dir, local_manifest):
+    """
+    对刚复制的文件重新计算哈希，与远程 manifest 比较，结果写入 local_manifest。
+    返回校验通过的文件名列表。
+    """
+    verified = []
+    for name in names:
+        path = os.path.join(dest_dir, name)
+        entry = dict(remote_manifest[name])
+        entry["verified"] = (os.path.isfile(path)
+                             and os.path.getsize(path) == entry["size"]
+                             and file_sha256(path) == entry["sha256"])
+        local_manifest[name] = entry
+        if entry["verified"]:
+            verified.append(name)
+    return verified
+
+
+def prune_remote(remote_host, names, remote_user=REMOTE_USER, remote_dir=REMOTE_DATA_DIR):
+    """删除 tile 上已经校验通过的文件"""
+    for i in range(0, len(names), SCP_BATCH):
+        batch = names[i:i + SCP_BATCH]
+        remote_cmd = "cd {} && rm -f -- {}".format(remote_dir, " ".join(shlex.quote(n) for n in batch))
+        result = subprocess.run(["ssh", f"{remote_user}@{remote_host}", remote_cmd],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"[{remote_host}] 删除远程文件失败:\n{result.stderr.strip()}")
+
+
+def collect_host(host_key, remote_host, dest_base=DEST_BASE_DIR, bwlimit_kbit=None, prune=False,
+                 transfer="scp", sc16=False, level=3):
+    """
+    收集单个 tile 的新数据，返回统计信息字典
+    {host, pending, copied, bytes, failed, seconds, wire_bytes}，连接失败时返回 None。
+    wire_bytes 只在 stream 模式下统计（scp 模式为 None）。
+    """
+    started = time.time()
+    dest_dir = os.path.join(dest_base, host_key)
+    os.makedirs(dest_dir, exist_ok=True)
+    manifest_path = os.path.join(dest_dir, MANIFEST_NAME)
+    local_manifest = load_manifest(manifest_path)
+
+    remote_manifest = get_remote_manifest(remote_host)
+    if remote_manifest is None:
+        return None
+
+    pending = diff_manifest(remote_manifest, local_manifest)
+    copied = []
+    wire_bytes = None
+    if pending:
+        print(f"[{host_key}] 需要传输 {len(pending)} 个文件")
+        if transfer == "stream":
+            stats = stream_files(remote_host, pending, dest_dir, bwlimit_kbit, sc16, level)
+            wire_bytes = stats["wire_bytes"]
+            if stats["seconds"] > 0 and wire_bytes:
+                print(f"[{host_key}] 压缩比 {stats['raw_bytes'] / wire_bytes:.2f}，"
+                      f"有效吞吐 {stats['raw_bytes'] * 8 / 1e6 / stats['seconds']:.1f} Mbit/s"
+                      f"（线上 {wire_bytes * 8 / 1e6 / stats['seconds']:.1f} Mbit/s）")
+        else:
+            scp_files(remote_host, pending, dest_dir, bwlimit_kbit)
+        copied = verify_files(pending, remote_manifest, dest_dir, local_manifest)
+        save_manifest(manifest_path, local_manifest)
+
+    if prune:
+        # 只删除本地已校验、且远程内容未再变化的文件
+        safe = [name for name, entry in remote_manifest.items()
+                if local_manifest.get(name, {}).get("verified")
+                and local_manifest[name]["sha256"] == entry["sha256"]]
+        if safe:
+            prune_remote(remote_host, safe)
+            print(f"[{host_key}] 已删除 tile 上 {len(safe)} 个已收集的文件")
+
+    return {
+        "host": host_key,
+        "pending": len(pending),
+        "copied": len(copied),
+        "bytes": sum(remote_manifest[name]["size"] for name in copied),
+        "failed": sorted(set(pending) - set(copied)),
+        "seconds": time.time() - started,
+        "wire_bytes": wire_bytes,
+    }
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="增量收集各 tile 的 Raw_Data")
+    parser.add_argument("--inventory", default=INVENTORY_PATH, help="inventory 文件路径")
+    parser.add_argument("--dest", default=DEST_BASE_DIR, help="本地数据根目录")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="同时收集的 tile 数")
+    parser.add_argument("--bwlimit", type=float, default=None,
+                        help="总带宽上限（Mbit/s），在并发的 tile 之间平均分配")
+    parser.add_argument("--prune", action="store_true", help="校验通过后删除 tile 上的文件")
+    parser.add_argument("--transfer", choices=["scp", "stream"], default="scp",
+                        help="scp：逐文件复制；stream：tar + zstd 单连接流式传输")
+    parser.add_argument("--sc16", action="store_true",
+                        help="stream 模式下把 complex64 采集转换为 sc16 后再压缩（仅在可无损还原时）")
+    parser.add_argument("--level", type=int, default=3, help="zstd 压缩级别")
+    parser.add_argument("--check-sc16", action="store_true", help="只做 sc16 无损往返检查（UHD 格式数据）后退出")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.check_sc16:
+        sys.exit(0 if check_sc16_roundtrip() else 1)
+    hosts_info = get_ceiling_hosts(args.inventory)
+    print("提取到的 ceiling 组主机信息:", hosts_info)
+
+    bwlimit_kbit = args.bwlimit * 1000.0 / args.jobs if args.bwlimit else None
+
+    started = time.time()
+    total_bytes = 0
+    total_wire = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {
+            executor.submit(collect_host, host_key, remote_host, args.dest, bwlimit_kbit, args.prune,
+                            args.transfer, args.sc16, args.level): host_key
+            for host_key, remote_host in hosts_info.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            host_key = futures[future]
+            try:
+                stats = future.result()
+            except Exception as exc:
+                print(f"[{host_key}] 收集出错: {exc}")
+                continue
+            if stats is None:
+                print(f"[{host_key}] 无法连接，跳过")
+                continue
+            total_bytes += stats["bytes"]
+            total_wire += stats["wire_bytes"] or 0
+            print(f"[{host_key}] 新文件 {stats['pending']}，校验通过 {stats['copied']}，"
+                  f"{stats['bytes'] / 1e6:.1f} MB，用时 {stats['seconds']:.1f}s")
+            for name in stats["failed"]:
+                print(f"[{host_key}] 校验失败: {name}")
+
+    elapsed = time.time() - started
+    print(f"共传输 {total_bytes / 1e6:.1f} MB，用时 {elapsed:.1f}s")
+    if total_wire:
+        print(f"线上 {total_wire / 1e6:.1f} MB，总压缩比 {total_bytes / total_wire:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 import yaml
+import json
 import subprocess
-import os
+import threading
 import concurrent.futures
 
 # 默认远程用户名及 inventory 文件路径（根据需要修改）
@@ -9,6 +10,129 @@ REMOTE_USER = "pi"
 INVENTORY_PATH = "../Process/inventory.yaml"
 # 远程数据目录（在远程设备上存放 .npy 文件的目录）
 REMOTE_DATA_DIR = "~/Techtile_Channel_Measurement/Raw_Data"
+# 同时打开的 SSH 会话上限，避免 VPN 过载
+MAX_SSH_SESSIONS = 8
+
+# 在远程设备上执行的脚本：
+#   - 遍历 Raw_Data 下所有 .npy 文件，利用 tools 模块计算相位差的循环均值/标准差、线性均值、
+#     每个通道的平均幅度、最大 I 和最大 Q 分量；
+#   - 按 (文件名, 大小, mtime) 缓存结果（Raw_Data/.process_cache.json），只处理新文件；
+#   - 新文件在进程池中并行处理（使用树莓派的所有核心）；
+#   - 每条结果以一行 JSON 输出，处理完一个文件就立即输出一行；
+#     记录中包含从文件名解析出的 tile / kind / round / timestamp / meas_id / experiment。
+REMOTE_SCRIPT = r'''
+import glob, json, os, sys, time
+from multiprocessing import Pool
+
+# 将 tools 模块所在目录添加到模块搜索路径中
+sys.path.insert(0, os.path.expanduser('~/Techtile_Channel_Measurement/client'))
+
+CACHE_NAME = ".process_cache.json"
+SAVE_CACHE_EVERY = 20
+
+
+def complete_record(record):
+    # 旧缓存中的记录没有文件名字段，按需补齐（此时才导入 tools）
+    if "tile" not in record:
+        import tools
+        record.update(tools.parse_capture_name(record["file"]))
+    # 文件名中不带时间戳的采集（如 usrp-cal-bf.py 的文件）使用文件的修改时间
+    if not record["timestamp"]:
+        record["timestamp"] = time.strftime("%Y%m%d_%H%M%S", time.localtime(record["mtime"]))
+    return record
+
+
+def process_file(job):
+    # numpy/scipy 只在确实有新文件时才导入，全部命中缓存时可立即返回
+    import numpy as np
+    import tools
+
+    file_path, size, mtime = job
+    record = {"file": os.path.basename(file_path), "size": size, "mtime": mtime}
+    try:
+        data = np.load(file_path)
+        if data.ndim != 2 or data.shape[0] != 2:
+            record["error"] = "invalid shape {} (expected 2 rows)".format(data.shape)
+        else:
+            record.update(tools.capture_summary(data))
+    except Exception as e:
+        # 读取失败（例如文件仍在写入）不缓存，下次重新处理
+        record["error"] = str(e)
+        record["transient"] = True
+    return complete_record(record)
+
+
+def save_cache(cache_path, cache):
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_path)
+
+
+def emit(record):
+    sys.stdout.write(json.dumps(record) + "\n")
+    sys.stdout.flush()
+
+
+raw_data_dir = os.path.expanduser(sys.argv[1])
+cache_path = os.path.join(raw_data_dir, CACHE_NAME)
+try:
+    with open(cache_path, "r") as f:
+        cache = json.load(f)
+except (OSError, ValueError):
+    cache = {}
+
+jobs = []
+fresh_cache = {}
+for file_path in sorted(glob.glob(os.path.join(raw_data_dir, "*.npy"))):
+    st = os.stat(file_path)
+    name = os.path.basename(file_path)
+    record = cache.get(name)
+    if record and record["size"] == st.st_size and record["mtime"] == st.st_mtime:
+        fresh_cache[name] = complete_record(record)
+        emit(dict(record, cached=True))
+    else:
+        jobs.append((file_path, st.st_size, st.st_mtime))
+
+if jobs:
+    with Pool(os.cpu_count()) as pool:
+        for i, record in enumerate(pool.imap_unordered(process_file, jobs)):
+            emit(record)
+            if not record.get("transient"):
+                fresh_cache[record["file"]] = record
+            if (i + 1) % SAVE_CACHE_EVERY == 0:
+                save_cache(cache_path, fresh_cache)
+save_cache(cache_path, fresh_cache)
+'''
+
+
+# 每条结果记录的字段及类型，顺序与 Process/result_records.py 中的 RESULT_DTYPE 一致
+RECORD_FIELDS = [
+    ("tile", str), ("kind", str), ("round", int), ("timestamp", str),
+    ("meas_id", int), ("experiment", str), ("file", str),
+    ("circ_mean", float), ("circ_std", float), ("linear_mean", float),
+    ("freq_offset_ch0", float), ("freq_offset_ch1", float),
+    ("avg_ampl_ch0", float), ("avg_ampl_ch1", float),
+    ("max_i_ch0", float), ("max_i_ch1", float),
+    ("max_q_ch0", float), ("max_q_ch1", float),
+]
+RECORD_DEFAULTS = {str: "", int: 0, float: float("nan")}
+
+
+def to_typed_record(record, device_name):
+    """
+    把远程返回的记录整理为固定字段、固定类型的字典（字段顺序见 RECORD_FIELDS）。
+    缺失的数值字段填 NaN；文件名中没有 tile 时使用设备名称；处理失败的记录保留 error 字段。
+    """
+    typed = {}
+    for name, type_ in RECORD_FIELDS:
+        value = record.get(name)
+        if value is None or value == "":
+            value = device_name if name == "tile" else (-1 if name == "meas_id" else RECORD_DEFAULTS[type_])
+        typed[name] = type_(value)
+    if "error" in record:
+        typed["error"] = record["error"]
+    return typed
 
 
 def get_ceiling_hosts(inventory_path):
@@ -32,100 +156,105 @@ def get_ceiling_hosts(inventory_path):
     return hosts_info
 
 
+def format_record_text(record):
+    """把一条处理结果转换为原来的文本块格式（extract_data.py / sort.py 依赖此格式）"""
+    file_name = record["file"]
+    lines = ["Processing file: {}".format(file_name)]
+    if "error" in record:
+        lines.append("Error processing {}: {}".format(file_name, record["error"]))
+        return "\n".join(lines)
+    lines.append("File: {}".format(file_name))
+    lines.append("  CircMean phase diff: {:.6f}".format(record["circ_mean"]))
+    lines.append("  Linear mean phase diff: {:.6f}".format(record["linear_mean"]))
+    lines.append("  Frequency offset CH0: {:.4f}".format(record["freq_offset_ch0"]))
+    lines.append("  Frequency offset CH1: {:.4f}".format(record["freq_offset_ch1"]))
+    lines.append("  Avg amplitude: CH0 {:.6f}, CH1 {:.6f}".format(record["avg_ampl_ch0"], record["avg_ampl_ch1"]))
+    lines.append("  Max I: CH0 {:.6f}, CH1 {:.6f}".format(record["max_i_ch0"], record["max_i_ch1"]))
+    lines.append("  Max Q: CH0 {:.6f}, CH1 {:.6f}".format(record["max_q_ch0"], record["max_q_ch1"]))
+    lines.append("-" * 40)
+    return "\n".join(lines)
+
+
 def process_remote_device(device_name, remote_ip):
     """
-    利用 SSH 登录远程设备，执行内嵌的 Python 脚本，
-    脚本遍历 REMOTE_DATA_DIR 目录下的所有 .npy 文件，
-    对每个文件使用 tools 模块处理 IQ 数据：
-      - 分别计算两个通道的相位及频率斜率，
-      - 计算两个通道间的相位差，得到循环均值和线性均值，
-      - 计算每个通道的平均幅度、最大 I 和最大 Q 分量。
-    脚本将处理结果（文本摘要）打印出来，最终由本地保存为 "{设备名称}_result.txt"。
-    同时在处理时打印当前处理的文件名称以便查看进度。
+    利用 SSH 登录远程设备，执行 REMOTE_SCRIPT，逐行读取返回的 JSON 记录。
+    返回记录列表，连接或远程执行失败时返回 None。
     """
-    remote_script = r'''
-import os, sys, glob, numpy as np
-# 将 tools 模块所在目录添加到模块搜索路径中
-sys.path.insert(0, os.path.expanduser('~/Techtile_Channel_Measurement/client'))
-import tools
-
-def process_data(raw_data_dir):
-    output_lines = []
-    npy_files = glob.glob(os.path.join(raw_data_dir, '*.npy'))
-    if not npy_files:
-        output_lines.append("No .npy files found in {}".format(raw_data_dir))
-        return "\n".join(output_lines)
-    for file_path in npy_files:
-        file_name = os.path.basename(file_path)
-        output_lines.append("Processing file: {}".format(file_name))
-        file_id = os.path.splitext(file_name)[0]
-        try:
-            data = np.load(file_path)
-            if data.ndim != 2 or data.shape[0] != 2:
-                output_lines.append("Skipping {}: invalid shape (expected 2 rows)".format(file_name))
-                continue
-            # 利用 tools 模块分别处理两个通道的 IQ 数据
-            phase_ch0, freq_slope_ch0 = tools.get_phases_and_apply_bandpass(data[0, :])
-            phase_ch1, freq_slope_ch1 = tools.get_phases_and_apply_bandpass(data[1, :])
-            freq_offset_ch0 = freq_slope_ch0 / (2*np.pi)
-            freq_offset_ch1 = freq_slope_ch1 / (2*np.pi)
-            phase_diff = tools.to_min_pi_plus_pi(phase_ch0 - phase_ch1, deg=False)
-            circ_mean = tools.circmean(phase_diff, deg=False)
-            linear_mean = np.mean(phase_diff)
-            avg_ampl = np.mean(np.abs(data), axis=1)
-            max_I = np.max(np.abs(np.real(data)), axis=1)
-            max_Q = np.max(np.abs(np.imag(data)), axis=1)
-
-            output_lines.append("File: {}".format(file_name))
-            output_lines.append("  CircMean phase diff: {:.6f}".format(circ_mean))
-            output_lines.append("  Linear mean phase diff: {:.6f}".format(linear_mean))
-            output_lines.append("  Frequency offset CH0: {:.4f}".format(freq_offset_ch0))
-            output_lines.append("  Frequency offset CH1: {:.4f}".format(freq_offset_ch1))
-            output_lines.append("  Avg amplitude: CH0 {:.6f}, CH1 {:.6f}".format(avg_ampl[0], avg_ampl[1]))
-            output_lines.append("  Max I: CH0 {:.6f}, CH1 {:.6f}".format(max_I[0], max_I[1]))
-            output_lines.append("  Max Q: CH0 {:.6f}, CH1 {:.6f}".format(max_Q[0], max_Q[1]))
-            output_lines.append("-" * 40)
-        except Exception as e:
-            output_lines.append("Error processing {}: {}".format(file_name, e))
-    return "\n".join(output_lines)
-
-raw_data_dir = os.path.expanduser("''' + REMOTE_DATA_DIR + r'''")
-result_text = process_data(raw_data_dir)
-print(result_text)
-'''
-    cmd = ["ssh", f"{REMOTE_USER}@{remote_ip}", "python3", "-"]
+    cmd = ["ssh", f"{REMOTE_USER}@{remote_ip}", "python3", "-", REMOTE_DATA_DIR]
     print(f"Processing device {device_name} ({remote_ip}) ...")
     try:
-        result = subprocess.run(cmd, input=remote_script, text=True,
-                                capture_output=True)
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, text=True)
     except Exception as e:
         print(f"Error connecting to {device_name} ({remote_ip}): {e}")
         return None
 
-    if result.returncode != 0:
-        print(f"Remote processing error on {device_name} ({remote_ip}):\n{result.stderr}")
+    # stderr 在单独的线程中读取，远程输出大量日志时不会因管道写满而卡住
+    stderr_lines = []
+    stderr_reader = threading.Thread(target=lambda: stderr_lines.extend(proc.stderr), daemon=True)
+    stderr_reader.start()
+
+    proc.stdin.write(REMOTE_SCRIPT)
+    proc.stdin.close()
+    records = []
+    for line in proc.stdout:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            record = None
+        if not isinstance(record, dict) or "file" not in record:
+            # 远程脚本中的 print / 警告等非记录输出：报告后跳过，不丢弃已收到的记录
+            print(f"[{device_name}] 忽略非 JSON 记录的输出: {line}")
+            continue
+        records.append(record)
+        if not record.get("cached"):
+            print(f"[{device_name}] {record['file']}")
+    proc.wait()
+    stderr_reader.join()
+    stderr = "".join(stderr_lines)
+
+    if proc.returncode != 0:
+        print(f"Remote processing error on {device_name} ({remote_ip}):\n{stderr}")
         return None
 
-    return result.stdout
+    return records
 
 
 def process_device(device_name, remote_ip):
     """
-    封装 process_remote_device() 并将结果保存到本地文件 {device_name}_result.txt
+    封装 process_remote_device() 并将结果保存到本地：
+      - {device_name}_result.jsonl：每个采集一行 JSON 记录（机器可读，字段见 RECORD_FIELDS）；
+      - {device_name}_result.txt：由记录生成的文本报告（兼容旧格式）。
     """
-    result_text = process_remote_device(device_name, remote_ip)
-    if result_text is not None:
+    records = process_remote_device(device_name, remote_ip)
+    if records is not None:
+        n_new = sum(1 for record in records if not record.get("cached"))
+        typed_records = [to_typed_record(record, device_name) for record in records]
+
+        jsonl_name = f"{device_name}_result.jsonl"
+        with open(jsonl_name, "w", encoding="utf-8") as f:
+            for record in typed_records:
+                f.write(json.dumps(record) + "\n")
+
         filename = f"{device_name}_result.txt"
+        if typed_records:
+            result_text = "\n".join(format_record_text(record) for record in typed_records)
+        else:
+            result_text = "No .npy files found in {}".format(REMOTE_DATA_DIR)
         with open(filename, "w", encoding="utf-8") as f:
-            f.write(result_text)
-        print(f"Result for {device_name} saved to {filename}")
+            f.write(result_text + "\n")
+        print(f"Result for {device_name} saved to {jsonl_name} and {filename} "
+              f"({n_new} new, {len(records) - n_new} cached)")
     else:
         print(f"Failed to process device {device_name} ({remote_ip})")
 
 
 def main():
     hosts_info = get_ceiling_hosts(INVENTORY_PATH)
-    with concurrent.futures.ThreadPoolExecutor() as executor:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_SSH_SESSIONS) as executor:
         futures = []
         for device_name, remote_ip in hosts_info.items():
             futures.append(executor.submit(process_device, device_name, remote_ip))
@@ -0,0 +1,86 @@
+"""
+Push the summary of a finished capture to the sync server (data port 5559).
+
+The server answers every message on its REP socket, so the tile knows the
+result has been stored. A lost server must never block or break a capture:
+on timeout the REQ socket is dropped and the push is reported as failed.
+
+Message layout (multipart):
+    frame 0: JSON header {"type": "capture", "tile", "file", "kind", "round",
+             "timestamp", "meas_id", "experiment", "summary": {...},
+             "trace": {"dtype", "decimation", "length"} (optional)}
+    frame 1: raw float32 bytes of the decimated phase-difference trace (optional)
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import zmq
+
+import tools
+
+DATA_PORT = 5559
+PUSH_TIMEOUT_MS = 5000
+
+
+def decimate_phase(phase_diff, factor):
+    """Block-wise circular mean of the phase difference, one value per `factor` samples."""
+    phase_diff = np.asarray(phase_diff)
+    n_blocks = len(phase_diff) // factor
+    blocks = phase_diff[:n_blocks * factor].reshape(n_blocks, factor)
+    return np.angle(np.sum(np.exp(1j * blocks), axis=1)).astype(np.float32)
+
+
+def build_message(tile, file_name, summary, phase_diff=None, decimation=0):
+    """Build the multipart frames for one capture."""
+    header = {"type": "capture", "tile": tile, "file": os.path.basename(file_name), "summary": summary}
+    info = tools.parse_capture_name(file_name)
+    for key in ("kind", "round", "timestamp", "meas_id", "experiment"):
+        header[key] = info[key]
+    frames = []
+    if phase_diff is not None and decimation > 0:
+        trace = decimate_phase(phase_diff, decimation)
+        header["trace"] = {"dtype": "float32", "decimation": int(decimation), "length": len(trace)}
+        frames.append(trace.tobytes())
+    return [json.dumps(header).encode("utf-8")] + frames
+
+
+def push_capture_summary(server_ip, tile, file_name, summary, phase_diff=None, decimation=0,
+                         port=DATA_PORT, timeout_ms=PUSH_TIMEOUT_MS, context=None):
+    """
+    Send one capture summary to the server and wait for its acknowledgement.
+    Returns True when the server replied "OK", False otherwise (never raises on network errors).
+    """
+    context = context or zmq.Context.instance()
+    socket = context.socket(zmq.REQ)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.setsockopt(zmq.RCVTIMEO, timeout_ms)
+    socket.setsockopt(zmq.SNDTIMEO, timeout_ms)
+    try:
+        socket.connect(f"tcp://{server_ip}:{port}")
+        socket.send_multipart(build_message(tile, file_name, summary, phase_diff, decimation))
+        reply = socket.recv_string()
+        return reply == "OK"
+    except zmq.ZMQError:
+        return False
+    finally:
+        socket.close()
+
+
+def push_in_background(server_ip, tile, file_name, summary, phase_diff=None, decimation=0, logger=None):
+    """
+    Push from a daemon thread so a slow or absent server cannot delay the next timed
+    USRP command. The outcome is reported through `logger` when given.
+    """
+    def _push():
+        ok = push_capture_summary(server_ip, tile, file_name, summary, phase_diff, decimation)
+        if logger is not None:
+            if ok:
+                logger.debug("Capture summary pushed to %s", server_ip)
+            else:
+                logger.error("Failed to push capture summary to %s", server_ip)
+
+    thread = threading.Thread(target=_push, name="PUSH_thread", daemon=True)
+    thread.start()
+    return thread
@@ -2,6 +2,8 @@ from scipy.signal import butter, sosfilt
 from scipy import stats
 import numpy as np
 
+from capture_names import parse_capture_name
+
 
 def circmean(arr, deg=True):
 
@@ -97,3 +99,45 @@ def get_phases_and_remove_CFO(x, fs=250e3, remove_first_samples=True):
     lin_regr = stats.linregress(t, angle_unwrapped)
     angles = angle_unwrapped - lin_regr.slope * t
     return angles[5000:] if remove_first_samples else angles
+
+
+def phase_difference(iq_samples):
+    """CH0 - CH1 phase difference (rad) after the bandpass filter."""
+    phase_ch0, _ = get_phases_and_apply_bandpass(iq_samples[0, :])
+    phase_ch1, _ = get_phases_and_apply_bandpass(iq_samples[1, :])
+    return to_min_pi_plus_pi(phase_ch0 - phase_ch1, deg=False)
+
+
+def capture_summary(iq_samples, phase_diff=None, circ_mean=None, linear_mean=None, avg_ampl=None, max_I=None,
+                    max_Q=None, freq_offset=None):
+    """Summary statistics of one 2-channel capture, as a dict of plain floats.
+
+    Values the caller already computed (Rx.py / usrp-cal-bf.py) are passed in and used as is;
+    the others are computed from iq_samples. freq_offset is (CH0, CH1) in Hz, or None when no
+    offset was measured: the fields are then None and stored as NULL.
+    """
+    if phase_diff is None:
+        phase_diff = phase_difference(iq_samples)
+    if circ_mean is None:
+        circ_mean = circmean(phase_diff, deg=False)
+    if linear_mean is None:
+        linear_mean = np.mean(phase_diff)
+    if avg_ampl is None:
+        avg_ampl = np.mean(np.abs(iq_samples), axis=1)
+    if max_I is None:
+        max_I = np.max(np.abs(np.real(iq_samples)), axis=1)
+    if max_Q is None:
+        max_Q = np.max(np.abs(np.imag(iq_samples)), axis=1)
+    return {
+        "circ_mean": float(circ_mean),
+        "circ_std": float(circstd(phase_diff, deg=False)),
+        "linear_mean": float(linear_mean),
+        "freq_offset_ch0": None if freq_offset is None else float(freq_offset[0]),
+        "freq_offset_ch1": None if freq_offset is None else float(freq_offset[1]),
+        "avg_ampl_ch0": float(avg_ampl[0]),
+        "avg_ampl_ch1": float(avg_ampl[1]),
+        "max_i_ch0": float(max_I[0]),
+        "max_i_ch1": float(max_I[1]),
+        "max_q_ch0": float(max_Q[0]),
+        "max_q_ch1": float(max_Q[1]),
+    }
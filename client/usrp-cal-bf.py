@@ -12,6 +12,7 @@ import yaml
 
 
 import tools
+import result_push
 
 CMD_DELAY = 0.05  # set a 50mS delay in commands
 # default values which will be overwritten by the conf YML
@@ -30,6 +31,9 @@ results = []
 
 SWITCH_LOOPBACK_MODE = 0x00000006 # which is 110
 SWITCH_RESET_MODE = 0x00000000
+PUSH_RESULTS = True  # push capture summaries to the sync server (port 5559)
+PUSH_PHASE_DECIMATION = 0  # >0: also push the phase-difference trace, decimated by this factor
+PHASE_CORRECTION_TABLE = ""  # table from Process/calibration_solver.py; empty: use the live correction
 
 import zmq
 
@@ -195,6 +199,14 @@ def rx_ref(usrp, rx_streamer, quit_event, duration, result_queue, start_time=Non
             avg_ampl[1],
         )
 
+        if PUSH_RESULTS and server_ip:
+            # get_phases_and_apply_bandpass does not estimate the CFO (slope is always 0): no freq_offset, stored as NULL
+            summary = tools.capture_summary(iq_samples, phase_diff, _circ_mean, _mean, avg_ampl, max_I, max_Q)
+            result_push.push_in_background(
+                server_ip, HOSTNAME, file_name_state, summary, phase_diff,
+                PUSH_PHASE_DECIMATION, logger=logger,
+            )
+
 
 def setup_clock(usrp, clock_src, num_mboards):
     usrp.set_clock_source(clock_src)
@@ -579,6 +591,28 @@ def measure_loopback(
     quit_event.clear()
 
 
+def load_phase_correction(path):
+    """
+    Per-tile correction (rad) from a table written by Process/calibration_solver.py,
+    or None when the table or this tile's entry is missing.
+    """
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(__file__), path)
+    try:
+        with open(path, "r") as table_yaml:
+            table = yaml.safe_load(table_yaml) or {}
+    except (OSError, yaml.YAMLError) as exc:
+        logger.error("Could not read phase correction table %s: %s", path, exc)
+        return None
+    if HOSTNAME not in table:
+        logger.error("Tile %s not found in phase correction table %s", HOSTNAME, path)
+        return None
+    entry = table[HOSTNAME]
+    logger.debug("Correction table: %.4f deg (std %.4f deg, n %d)",
+                 entry["correction_deg"], entry.get("std_deg", float("nan")), entry.get("n", 0))
+    return np.deg2rad(entry["correction_deg"])
+
+
 def tx_phase_coh(usrp, tx_streamer, quit_event, phase_corr, at_time, long_time=True):
     logger.debug("########### TX with adjusted phases ###########")
 
@@ -746,12 +780,20 @@ def main():
             except yaml.YAMLError as exc:
                 print(exc)
 
+        phase_corr = phi_LB + phi_P + np.deg2rad(phi_cable)
+
+        if PHASE_CORRECTION_TABLE:
+            table_corr = load_phase_correction(PHASE_CORRECTION_TABLE)
+            if table_corr is not None:
+                logger.debug("Live correction %.4f rad, using table correction %.4f rad", phase_corr, table_corr)
+                phase_corr = table_corr
+
         # benchmark without phased beamforming
         tx_phase_coh(
             usrp,
             tx_streamer,
             quit_event,
-            phase_corr=phi_LB + phi_P + np.deg2rad(phi_cable),
+            phase_corr=phase_corr,
             at_time=start_next_cmd,
             long_time=True,
         )
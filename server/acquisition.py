@@ -0,0 +1,280 @@
+"""
+Concurrent scope / positioner acquisition.
+
+The scope and the positioner are polled by two independent threads. Every reading
+is stamped with time.monotonic() at the middle of the call and stored in a ring
+buffer. The scope call blocks for a measurement, so it is polled back to back; the
+positioner returns its latest fix without blocking, so it is polled every
+POSITION_POLL_INTERVAL and a fix whose own timestamp (pos.t / pos.utc) has not changed
+is skipped. Fixes are placed in time by that timestamp, mapped onto the server's
+monotonic clock with the smallest observed (poll time - fix time), so a fix picked up
+late is not treated as fresh.
+
+Acquisition.read_new() joins the two streams: the position (x, y, z, utc) is linearly
+interpolated at every power timestamp that is bracketed by fixes, so each output
+sample is a power reading with the position the rover had at that moment. Output
+records use measurement_log.LOG_DTYPE and can be appended to a MeasurementLog directly.
+
+FakeScope and FakePositioner stand in for the hardware when testing; FakePositioner
+is non-blocking (latest fix at update_rate, like PositionerClient.get_data()) by
+default, or blocking with update_rate=None:
+
+    acq = Acquisition(FakeScope(), FakePositioner())
+    acq.start(); time.sleep(2); samples = acq.read_new(); acq.stop()
+"""
+import time
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+from measurement_log import LOG_DTYPE
+
+RING_CAPACITY = 1 << 16
+MAX_POSITION_GAP = 0.5      # s, no interpolation across larger gaps in the position stream
+POSITION_POLL_INTERVAL = 0.01   # s, the positioner call does not block
+
+POWER_DTYPE = np.dtype([("t", "f8"), ("power_dBm", "f8")])
+POSITION_DTYPE = np.dtype([("t", "f8"), ("x", "f8"), ("y", "f8"), ("z", "f8"), ("utc", "f8"), ("rm", "f8", (9,))])
+
+
+class RingBuffer:
+    """Fixed-capacity ring of structured records; readers keep their own cursor (total records seen)"""
+
+    def __init__(self, dtype, capacity=RING_CAPACITY):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def push(self, record):
+        with self.lock:
+            self.data[self.count % self.capacity] = record
+            self.count += 1
+
+    def read(self, since):
+        """Records with sequence number >= since, oldest first; returns (records, new cursor, lost)"""
+        with self.lock:
+            start = max(since, self.count - self.capacity)
+            idx = np.arange(start, self.count) % self.capacity
+            return self.data[idx].copy(), self.count, start - since
+
+
+class Poller(threading.Thread):
+    """
+    Calls read() in a loop and pushes convert(value, t) into a ring buffer. None readings
+    are skipped, and so are readings whose key(value) equals the previous one (an
+    unchanged fix). interval is the minimum time between calls.
+    """
+
+    def __init__(self, name, read, convert, ring, interval=0.0, key=None):
+        super().__init__(name=name, daemon=True)
+        self.read, self.convert, self.ring = read, convert, ring
+        self.interval = interval
+        self.key = key
+        self.last_key = None
+        self.stop_event = threading.Event()
+        self.errors = 0
+        self.duplicates = 0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            t0 = time.monotonic()
+            try:
+                value = self.read()
+            except Exception as e:
+                self.errors += 1
+                print(f"{self.name}: {e}")
+                self.stop_event.wait(0.1)
+                continue
+            t1 = time.monotonic()
+            if value is not None and self.key is not None:
+                key = self.key(value)
+                if key == key and key == self.last_key:     # NaN keys are never duplicates
+                    self.duplicates += 1
+                    value = None
+                else:
+                    self.last_key = key
+            if value is not None:
+                self.ring.push(self.convert(value, 0.5 * (t0 + t1)))
+            if self.interval:
+                self.stop_event.wait(max(0.0, self.interval - (time.monotonic() - t0)))
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def power_record(power_dBm, t):
+    return t, power_dBm
+
+
+def fix_time(pos):
+    """The positioner's own timestamp of a fix (s), NaN if it has none"""
+    try:
+        return float(getattr(pos, "t", getattr(pos, "utc", np.nan)))
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def position_record(pos, t):
+    rm = getattr(pos, "rm", None)
+    rm = np.full(9, np.nan) if rm is None else np.ravel(rm)[:9]
+    return t, pos.x, pos.y, pos.z, fix_time(pos), rm
+
+
+def align(power, positions, max_gap=MAX_POSITION_GAP):
+    """
+    Interpolate positions at the power timestamps. Only power samples inside the
+    position time range and not inside a gap longer than max_gap are returned.
+    Returns LOG_DTYPE records.
+    """
+    if len(power) == 0 or len(positions) < 2:
+        return np.zeros(0, dtype=LOG_DTYPE)
+    t_pos = positions["t"]
+    t = power["t"]
+    right = np.searchsorted(t_pos, t, side="right")
+    inside = (right > 0) & (right < len(t_pos))
+    right = np.clip(right, 1, len(t_pos) - 1)
+    inside &= (t_pos[right] - t_pos[right - 1]) <= max_gap
+    t, right, power = t[inside], right[inside], power[inside]
+
+    out = np.zeros(len(t), dtype=LOG_DTYPE)
+    for field in ("x", "y", "z", "utc"):
+        out[field] = np.interp(t, t_pos, positions[field])
+    nearest = np.where(t - t_pos[right - 1] <= t_pos[right] - t, right - 1, right)
+    out["rm"] = positions["rm"][nearest]
+    out["power_dBm"] = power["power_dBm"]
+    out["t_mono"] = t
+    return out
+
+
+class Acquisition:
+    def __init__(self, scope, positioner, max_gap=MAX_POSITION_GAP, capacity=RING_CAPACITY):
+        self.power_ring = RingBuffer(POWER_DTYPE, capacity)
+        self.position_ring = RingBuffer(POSITION_DTYPE, capacity)
+        self.pollers = [
+            Poller("scope", scope.get_power_dBm, power_record, self.power_ring),
+            Poller("positioner", positioner.get_data, position_record, self.position_ring,
+                   interval=POSITION_POLL_INTERVAL, key=fix_time),
+        ]
+        self.max_gap = max_gap
+        self.clock_offset = np.inf      # min(poll time - fix time): maps fix timestamps to monotonic time
+        self.power_cursor = 0
+        self.position_cursor = 0
+        self.pending_power = np.zeros(0, dtype=POWER_DTYPE)
+        self.recent_positions = np.zeros(0, dtype=POSITION_DTYPE)
+        self.lost = 0
+
+    def start(self):
+        for poller in self.pollers:
+            poller.start()
+
+    def stop(self):
+        for poller in self.pollers:
+            poller.stop()
+        for poller in self.pollers:
+            poller.join(timeout=2.0)
+
+    def read_new(self):
+        """
+        Aligned samples (LOG_DTYPE) for all power readings that are now bracketed by
+        position samples. Power readings newer than the last position wait for the next call;
+        readings that can no longer be bracketed are dropped.
+        """
+        power, self.power_cursor, lost_power = self.power_ring.read(self.power_cursor)
+        positions, self.position_cursor, lost_pos = self.position_ring.read(self.position_cursor)
+        self.lost += lost_power + lost_pos
+        power = np.concatenate((self.pending_power, power))
+        positions = np.concatenate((self.recent_positions, self.fix_times(positions)))
+        if len(positions) == 0:
+            self.pending_power = power
+            return np.zeros(0, dtype=LOG_DTYPE)
+
+        ready = power["t"] <= positions["t"][-1]
+        self.pending_power = power[~ready]
+        # keep the last position so the next batch of power readings can be bracketed
+        self.recent_positions = positions[-1:]
+        return align(power[ready], positions, self.max_gap)
+
+    def fix_times(self, positions):
+        """
+        Replace the poll time of fixes that carry their own timestamp by that timestamp on
+        the monotonic clock. The offset is the smallest (poll time - fix time) seen so far,
+        i.e. the clock offset plus the shortest delivery delay; it only moves when a fix
+        arrives faster than any before.
+        """
+        stamped = np.isfinite(positions["utc"])
+        if not stamped.any():
+            return positions
+        self.clock_offset = min(self.clock_offset, float(np.min(positions["t"][stamped] - positions["utc"][stamped])))
+        positions = positions.copy()
+        positions["t"][stamped] = positions["utc"][stamped] + self.clock_offset
+        # the mapping can only move fixes earlier, keep the stream ordered for interpolation
+        return positions[np.argsort(positions["t"], kind="stable")]
+
+    def rates(self, seconds):
+        """Samples per second of each stream over `seconds` of acquisition"""
+        return self.power_ring.count / seconds, self.position_ring.count / seconds
+
+
+class FakeScope:
+    """Scope stand-in: a smooth power pattern along x/y around -30 dBm, with a fixed read latency"""
+
+    def __init__(self, positioner=None, latency=0.01, noise_dB=0.5, seed=None):
+        self.positioner = positioner
+        self.latency = latency
+        self.noise_dB = noise_dB
+        self.rng = np.random.default_rng(seed)
+
+    def get_power_dBm(self):
+        time.sleep(self.latency)
+        x, y = self.positioner.position_at(time.monotonic())[:2] if self.positioner else (0.0, 0.0)
+        return -30 + 6 * np.cos(2 * np.pi * x / 0.326) * np.cos(2 * np.pi * y / 0.326) + \
+            self.noise_dB * self.rng.standard_normal()
+
+
+class FakePositioner:
+    """
+    Positioner stand-in: a rover moving in a lawnmower pattern over the floor.
+    With update_rate (Hz) get_data() is non-blocking like PositionerClient: it returns the
+    latest fix (None before the first one), stamped with the wall-clock time of that fix.
+    With update_rate=None every call blocks for `latency` and returns a fresh fix.
+    """
+
+    def __init__(self, update_rate=10.0, latency=0.03, speed=0.3, x_range=(0.5, 7.5), y_range=(0.5, 3.5),
+                 lane=0.3):
+        self.update_rate = update_rate
+        self.latency = latency
+        self.speed = speed
+        self.x_range, self.y_range, self.lane = x_range, y_range, lane
+        self.t0 = time.monotonic()
+
+    def start(self):
+        self.t0 = time.monotonic()
+
+    def stop(self):
+        pass
+
+    def position_at(self, t):
+        width = self.x_range[1] - self.x_range[0]
+        s = (t - self.t0) * self.speed
+        lane, along = divmod(s, width + self.lane)
+        n_lanes = int((self.y_range[1] - self.y_range[0]) / self.lane) + 1
+        lane = int(lane) % n_lanes
+        along = min(along, width)
+        x = self.x_range[0] + (along if lane % 2 == 0 else width - along)
+        y = self.y_range[0] + lane * self.lane
+        return x, y, 0.1
+
+    def get_data(self):
+        if self.update_rate is None:
+            time.sleep(self.latency)
+            t_fix = time.monotonic()
+        else:
+            now = time.monotonic()
+            n = np.floor((now - self.t0) * self.update_rate)
+            if n < 1:
+                return None
+            t_fix = self.t0 + n / self.update_rate
+        x, y, z = self.position_at(t_fix)
+        return SimpleNamespace(x=x, y=y, z=z, t=time.time() - (time.monotonic() - t_fix))
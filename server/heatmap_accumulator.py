@@ -0,0 +1,127 @@
+"""
+Online heatmap of rover power measurements on a fixed x/y grid.
+
+Every sample is binned into a grid cell; per cell we keep the count, the running
+mean and M2 of the linear power (nW, Welford/Chan update) and the maximum. Batches
+are folded in with np.bincount on the flat cell indices, so adding n samples is
+O(n + cells) and reading or saving the heatmap is O(cells) however long the run is.
+
+    acc = HeatmapAccumulator()
+    acc.add(pos.x, pos.y, power_dBm)
+    mean_dBm = acc.heatmap("mean_dBm")     # (ny, nx), NaN where no samples
+    acc.save("../data/heatmap-<name>.npz")
+"""
+import numpy as np
+
+# Techtile floor (m)
+X_MIN, X_MAX = 0.0, 8.4
+Y_MIN, Y_MAX = 0.0, 4.2
+CELL_SIZE = 0.1
+
+
+def dbm_to_nw(power_dBm):
+    return 10 ** ((np.asarray(power_dBm, dtype=np.float64) + 60) / 10)
+
+
+def nw_to_dbm(power_nW):
+    with np.errstate(divide="ignore"):
+        return 10 * np.log10(power_nW) - 60
+
+
+class HeatmapAccumulator:
+    def __init__(self, x_min=X_MIN, x_max=X_MAX, y_min=Y_MIN, y_max=Y_MAX, cell_size=CELL_SIZE):
+        self.x_min, self.y_min = float(x_min), float(y_min)
+        self.cell_size = float(cell_size)
+        self.nx = int(np.ceil((x_max - x_min) / cell_size))
+        self.ny = int(np.ceil((y_max - y_min) / cell_size))
+        cells = self.nx * self.ny
+        self.count = np.zeros(cells, dtype=np.int64)
+        self.mean = np.zeros(cells)           # linear power, nW
+        self.m2 = np.zeros(cells)             # sum of squared deviations, nW^2
+        self.max = np.full(cells, -np.inf)    # nW
+        self.dropped = 0                      # samples outside the grid
+
+    @property
+    def shape(self):
+        return self.ny, self.nx
+
+    def cell_index(self, x, y):
+        """Flat cell index for each position, -1 outside the grid"""
+        ix = np.floor((np.asarray(x, dtype=np.float64) - self.x_min) / self.cell_size).astype(np.int64)
+        iy = np.floor((np.asarray(y, dtype=np.float64) - self.y_min) / self.cell_size).astype(np.int64)
+        inside = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        return np.where(inside, iy * self.nx + ix, -1)
+
+    def add(self, x, y, power_dBm):
+        """Add one sample or a batch (scalars or equally long arrays); NaN powers are skipped"""
+        x, y, power = np.atleast_1d(x, y, power_dBm)
+        idx = self.cell_index(x, y)
+        keep = (idx >= 0) & np.isfinite(power)
+        self.dropped += int(np.count_nonzero(~keep & np.isfinite(power)))
+        idx, p = idx[keep], dbm_to_nw(power[keep])
+        if len(idx) == 0:
+            return
+
+        cells = len(self.count)
+        n_b = np.bincount(idx, minlength=cells)
+        touched = n_b > 0
+        mean_b = np.zeros(cells)
+        mean_b[touched] = np.bincount(idx, p, cells)[touched] / n_b[touched]
+        m2_b = np.bincount(idx, (p - mean_b[idx]) ** 2, cells)
+
+        # Chan et al. merge of the running (count, mean, M2) with the batch statistics
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        safe_n = np.maximum(n, 1)
+        self.mean = np.where(touched, self.mean + delta * n_b / safe_n, self.mean)
+        self.m2 = np.where(touched, self.m2 + m2_b + delta ** 2 * n_a * n_b / safe_n, self.m2)
+        self.count = n
+        np.maximum.at(self.max, idx, p)
+
+    def heatmap(self, stat="mean_dBm"):
+        """
+        (ny, nx) map of one statistic, NaN in empty cells:
+        count, mean_nW, mean_dBm, max_nW, max_dBm, std_nW.
+        """
+        empty = self.count == 0
+        if stat == "count":
+            return self.count.reshape(self.shape)
+        if stat in ("mean_nW", "mean_dBm"):
+            values = self.mean
+        elif stat in ("max_nW", "max_dBm"):
+            values = self.max
+        elif stat == "std_nW":
+            values = np.sqrt(self.m2 / np.maximum(self.count - 1, 1))
+        else:
+            raise ValueError(f"unknown statistic: {stat}")
+        values = np.where(empty, np.nan, values)
+        if stat.endswith("_dBm"):
+            values = nw_to_dbm(values)
+        return values.reshape(self.shape)
+
+    def extent(self):
+        """(x_min, x_max, y_min, y_max) of the grid, for imshow"""
+        return (self.x_min, self.x_min + self.nx * self.cell_size,
+                self.y_min, self.y_min + self.ny * self.cell_size)
+
+    def save(self, path):
+        """Only non-empty cells are stored"""
+        cells = np.flatnonzero(self.count)
+        np.savez_compressed(path, grid=np.array([self.x_min, self.y_min, self.cell_size, self.nx, self.ny]),
+                            cells=cells.astype(np.int32), count=self.count[cells], mean=self.mean[cells],
+                            m2=self.m2[cells], max=self.max[cells], dropped=self.dropped)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            x_min, y_min, cell_size, nx, ny = data["grid"]
+            acc = cls(x_min, x_min + nx * cell_size, y_min, y_min + ny * cell_size, cell_size)
+            acc.nx, acc.ny = int(nx), int(ny)
+            cells = data["cells"]
+            acc.count[cells] = data["count"]
+            acc.mean[cells] = data["mean"]
+            acc.m2[cells] = data["m2"]
+            acc.max[cells] = data["max"]
+            acc.dropped = int(data["dropped"])
+        return acc
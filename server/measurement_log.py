@@ -0,0 +1,189 @@
+"""
+Append-only measurement log for the rover scripts.
+
+Samples are structured records (LOG_DTYPE) buffered in memory and appended to
+`<name>.npy` in fixed-size chunks, so saving never rewrites earlier data. The file
+is a regular .npy with a fixed-size header whose row count is updated at every sync,
+so np.load() works on it; read_log() memory-maps it.
+
+Crash safety: every sync fsyncs the data first and only then appends one entry per
+written chunk (cumulative rows + CRC32) to `<name>.npy.idx` and fsyncs that. After a
+crash or Ctrl+C the index gives the last committed row count; whole records written
+after it are recovered unless they are zero-filled pages that never reached the disk.
+"""
+import os
+import ast
+import time
+import zlib
+
+import numpy as np
+from numpy.lib import format as npy_format
+
+CHUNK_ROWS = 1024
+SYNC_EVERY = 10.0       # s
+HEADER_SIZE = 512       # bytes, fixed so the header can be rewritten in place
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+LOG_DTYPE = np.dtype([
+    ("x", "f8"), ("y", "f8"), ("z", "f8"),
+    ("utc", "f8"),              # positioner timestamp
+    ("rm", "f8", (9,)),         # positioner rotation matrix, NaN if not provided
+    ("power_dBm", "f8"),
+    ("t_mono", "f8"),           # time.monotonic() on the server when the sample was taken
+])
+
+INDEX_DTYPE = np.dtype([("rows", "<u8"), ("crc32", "<u4"), ("closed", "<u4")])
+
+
+def npy_header(dtype, rows):
+    """.npy v1.0 header padded to HEADER_SIZE bytes"""
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({},), }}".format(
+        npy_format.dtype_to_descr(dtype), rows)
+    pad = HEADER_SIZE - len(NPY_MAGIC) - 2 - len(header) - 1
+    if pad < 0:
+        raise ValueError("dtype description does not fit in the log header")
+    header = (header + " " * pad + "\n").encode("latin1")
+    return NPY_MAGIC + len(header).to_bytes(2, "little") + header
+
+
+def record_from_position(pos, power_dBm, t_mono=None):
+    """One LOG_DTYPE record from a positioner sample and a scope reading"""
+    record = np.zeros((), dtype=LOG_DTYPE)
+    record["x"], record["y"], record["z"] = pos.x, pos.y, pos.z
+    record["utc"] = getattr(pos, "t", getattr(pos, "utc", np.nan))
+    rm = getattr(pos, "rm", None)
+    record["rm"] = np.nan if rm is None else np.ravel(rm)[:9]
+    record["power_dBm"] = power_dBm
+    record["t_mono"] = time.monotonic() if t_mono is None else t_mono
+    return record
+
+
+class MeasurementLog:
+    def __init__(self, path, dtype=LOG_DTYPE, chunk_rows=CHUNK_ROWS, sync_every=SYNC_EVERY):
+        if not path.endswith(".npy"):
+            path += ".npy"
+        if os.path.exists(path):
+            raise FileExistsError(f"{path} already exists")
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.chunk_rows = chunk_rows
+        self.sync_every = sync_every
+        self.buffer = np.zeros(chunk_rows, dtype=self.dtype)
+        self.buffered = 0
+        self.rows = 0                   # rows written to the data file
+        self.pending_index = []         # index entries waiting for the next sync
+        self.last_sync = time.monotonic()
+
+        self.data = open(path, "wb")
+        self.data.write(npy_header(self.dtype, 0))
+        self.index = open(path + ".idx", "wb")
+        self.sync()
+
+    def append(self, record):
+        """Append one record (structured scalar / tuple) or an array of records"""
+        records = np.atleast_1d(np.asarray(record, dtype=self.dtype))
+        while len(records):
+            n = min(len(records), self.chunk_rows - self.buffered)
+            self.buffer[self.buffered:self.buffered + n] = records[:n]
+            self.buffered += n
+            records = records[n:]
+            if self.buffered == self.chunk_rows:
+                self._write_chunk()
+        if time.monotonic() - self.last_sync >= self.sync_every:
+            self.sync()
+
+    def append_sample(self, pos, power_dBm, t_mono=None):
+        self.append(record_from_position(pos, power_dBm, t_mono))
+
+    def _write_chunk(self):
+        chunk = self.buffer[:self.buffered].tobytes()
+        self.data.write(chunk)
+        self.rows += self.buffered
+        self.pending_index.append((self.rows, zlib.crc32(chunk), 0))
+        self.buffered = 0
+
+    def sync(self, closed=False):
+        """Write buffered rows, fsync the data, update the header row count, then commit the index"""
+        if self.buffered:
+            self._write_chunk()
+        self.data.flush()
+        os.fsync(self.data.fileno())
+        self.data.seek(0)
+        self.data.write(npy_header(self.dtype, self.rows))
+        self.data.seek(0, os.SEEK_END)
+        self.data.flush()
+        os.fsync(self.data.fileno())
+        if closed:
+            self.pending_index.append((self.rows, 0, 1))
+        if self.pending_index:
+            self.index.write(np.array(self.pending_index, dtype=INDEX_DTYPE).tobytes())
+            self.pending_index = []
+        self.index.flush()
+        os.fsync(self.index.fileno())
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.data.closed:
+            return
+        self.sync(closed=True)
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(path):
+    """(dtype, header row count, data offset) of a log file"""
+    with open(path, "rb") as f:
+        if f.read(len(NPY_MAGIC)) != NPY_MAGIC:
+            raise ValueError(f"{path} is not a measurement log")
+        header_len = int.from_bytes(f.read(2), "little")
+        header = ast.literal_eval(f.read(header_len).decode("latin1"))
+    return npy_format.descr_to_dtype(header["descr"]), header["shape"][0], len(NPY_MAGIC) + 2 + header_len
+
+
+def read_index(path):
+    index_path = path + ".idx"
+    if not os.path.exists(index_path):
+        return np.zeros(0, dtype=INDEX_DTYPE)
+    raw = open(index_path, "rb").read()
+    return np.frombuffer(raw[:len(raw) - len(raw) % INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE)
+
+
+def read_log(path, recover=True, verify=False):
+    """
+    Memory-map a measurement log. The committed row count comes from the index
+    (or the header, whichever is larger); with recover=True whole records written
+    after the last commit are included too, minus trailing zero-filled records.
+    verify=True checks the CRC32 of every committed chunk (reads the whole file).
+    """
+    if not path.endswith(".npy"):
+        path += ".npy"
+    dtype, header_rows, offset = read_header(path)
+    index = read_index(path)
+    available = (os.path.getsize(path) - offset) // dtype.itemsize
+    rows = min(max(int(index["rows"].max()) if len(index) else 0, header_rows), available)
+    if len(index) and index["closed"][-1]:
+        recover = False
+    if recover and available > rows:
+        tail = np.memmap(path, dtype=dtype, mode="r", offset=offset + rows * dtype.itemsize,
+                         shape=(available - rows,))
+        written = np.flatnonzero(tail["t_mono"] != 0) if "t_mono" in dtype.names else np.arange(len(tail))
+        rows += int(written[-1]) + 1 if len(written) else 0
+    if rows == 0:
+        return np.zeros(0, dtype=dtype)
+    log = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(rows,))
+
+    if verify:
+        start = 0
+        for end, crc, closed in index.tolist():
+            if closed or end == start:
+                continue
+            if end > rows or zlib.crc32(log[start:end].tobytes()) != crc:
+                raise ValueError(f"{path}: chunk ending at row {end} is corrupt")
+            start = end
+    return log
@@ -9,6 +9,9 @@ from TechtilePlotter.TechtilePlotter import TechtilePlotter
 
 import os
 from yaml_utils import read_yaml_file
+from heatmap_accumulator import HeatmapAccumulator
+from measurement_log import MeasurementLog
+from acquisition import Acquisition
 from time import sleep, time
 import numpy as np
 import zmq
@@ -24,6 +27,11 @@ positioner = PositionerClient(config=config["positioning"], backend="zmq")
 
 positioner.start()
 
+# scope and positioner are polled by separate threads; read_new() returns power samples
+# with the rover position interpolated at each power timestamp
+acquisition = Acquisition(scope, positioner)
+acquisition.start()
+
 
 script_started = time()
 
@@ -60,33 +68,38 @@ plt = TechtilePlotter(realtime=True)
 meas_id, unique_id = wait_till_go_from_server()
 sleep(29.0)  # wake-up 10 seconds before rover starts to move
 
-# start to measure for XX long
+# start to measure for XX long (drop what was polled while waiting)
+acquisition.read_new()
 start = time()
 
-positions = []
-values = []
-
-last_save = -1
-
-while True:
-
-    power_dBm = scope.get_power_dBm()
-    pos = positioner.get_data()
-
-    if pos is not None:
-        print(power_dBm)
-        positions.append(pos)
-        print(pos)
-        values.append(power_dBm)
-        plt.measurements_rt(pos.x, pos.y, pos.z, power_dBm)
-    sleep(0.1)
-
-    if last_save + SAVE_EVERY < time():
-        np.save(arr=positions, file=f"../data/positions-{unique_id}")
-        np.save(arr=values, file=f"../data/values-{unique_id}")
-        last_save = time()
-print("Ctrl+C pressed. Exiting loop and saving...")
-# meas_name = f"bf-ceiling-grid-20241105-70db-tx"
-np.save(arr=positions, file=f"../data/positions-{unique_id}")
-np.save(arr=values, file=f"../data/values-{unique_id}")
-positioner.stop()
+# samples go to an append-only log (chunked writes + periodic fsync), not re-saved lists
+log = MeasurementLog(f"../data/measurements-{unique_id}")
+heatmap = HeatmapAccumulator()  # running per-cell statistics, O(cells) to save
+
+last_save = time()
+
+try:
+    while True:
+
+        samples = acquisition.read_new()
+
+        if len(samples):
+            print(f"{len(samples)} samples, last {samples['power_dBm'][-1]:.2f} dBm at "
+                  f"({samples['x'][-1]:.3f}, {samples['y'][-1]:.3f}, {samples['z'][-1]:.3f})")
+            log.append(samples)
+            heatmap.add(samples["x"], samples["y"], samples["power_dBm"])
+            # one point per batch keeps the live plot cheap; every sample is in the log and the heatmap
+            last = samples[-1]
+            plt.measurements_rt(last["x"], last["y"], last["z"], last["power_dBm"])
+        sleep(0.1)
+
+        if last_save + SAVE_EVERY < time():
+            heatmap.save(f"../data/heatmap-{unique_id}.npz")
+            last_save = time()
+finally:
+    print("Ctrl+C pressed. Exiting loop and saving...")
+    # meas_name = f"bf-ceiling-grid-20241105-70db-tx"
+    log.close()
+    heatmap.save(f"../data/heatmap-{unique_id}.npz")
+    acquisition.stop()
+    positioner.stop()
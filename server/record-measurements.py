@@ -9,6 +9,9 @@ from TechtilePlotter.TechtilePlotter import TechtilePlotter
 
 import os
 from yaml_utils import read_yaml_file
+from heatmap_accumulator import HeatmapAccumulator
+from measurement_log import MeasurementLog
+from acquisition import Acquisition
 from time import sleep, time
 import numpy as np
 import zmq
@@ -23,6 +26,11 @@ positioner = PositionerClient(config=config["positioning"], backend="zmq")
 
 positioner.start()
 
+# scope and positioner are polled by separate threads; read_new() returns power samples
+# with the rover position interpolated at each power timestamp
+acquisition = Acquisition(scope, positioner)
+acquisition.start()
+
 
 script_started = time()
 
@@ -58,6 +66,7 @@ def wait_till_go_from_server(ip="10.128.52.53"):
 TIME_TO_MEAS_PER_EXP = 5.0
 
 counter = 0
+log = None
 
 try:
     while True:
@@ -65,31 +74,35 @@ try:
         meas_id, unique_id = wait_till_go_from_server()
         sleep(29.0)  # wake-up 10 seconds before rover starts to move
 
-        # start to measure for XX long
-        start = time()
+        counter += 1
+        meas_name = f"gausbf-ceiling-grid-{meas_id}-{unique_id}-{counter}"
+        # samples go to an append-only log (chunked writes + periodic fsync), not re-saved lists
+        log = MeasurementLog(f"../data/measurements-{meas_name}")
+        heatmap = HeatmapAccumulator()
 
-        positions = []
-        values = []
+        # start to measure for XX long (drop what was polled while waiting)
+        acquisition.read_new()
+        start = time()
 
         while time() - start < TIME_TO_MEAS_PER_EXP:
 
-            power_dBm = scope.get_power_dBm()
-            pos = positioner.get_data()
+            samples = acquisition.read_new()
 
-            if pos is not None:
-                print(power_dBm)
-                positions.append(pos)
-                print(pos)
-                values.append(power_dBm)
-                plt.measurements_rt(pos.x, pos.y, pos.z, power_dBm)
+            if len(samples):
+                print(f"{len(samples)} samples, last {samples['power_dBm'][-1]:.2f} dBm at "
+                      f"({samples['x'][-1]:.3f}, {samples['y'][-1]:.3f}, {samples['z'][-1]:.3f})")
+                log.append(samples)
+                heatmap.add(samples["x"], samples["y"], samples["power_dBm"])
+                # one point per batch keeps the live plot cheap; every sample is in the log and the heatmap
+                last = samples[-1]
+                plt.measurements_rt(last["x"], last["y"], last["z"], last["power_dBm"])
             sleep(0.1)
-        counter+= 1
-        meas_name = f"gausbf-ceiling-grid-{meas_id}-{unique_id}-{counter}"
-        np.save(arr=positions, file=f"../data/positions-{meas_name}")
-        np.save(arr=values, file=f"../data/values-{meas_name}")
+        log.close()
+        heatmap.save(f"../data/heatmap-{meas_name}.npz")
 finally:
     print("Ctrl+C pressed. Exiting loop and saving...")
-    meas_name = f"gausbf-ceiling-grid-{meas_id}-{unique_id}-{counter}"
-    np.save(arr=positions, file=f"../data/positions-{meas_name}")
-    np.save(arr=values, file=f"../data/values-{meas_name}")
+    if log is not None:
+        log.close()
+        heatmap.save(f"../data/heatmap-{meas_name}.npz")
+    acquisition.stop()
     positioner.stop()
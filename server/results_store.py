@@ -0,0 +1,86 @@
+"""
+SQLite store for the capture summaries pushed by the tiles on the data port (5559).
+
+One row per capture in `captures`, indexed on (tile, experiment, meas_id) and
+(experiment, meas_id); optional decimated phase traces live in `traces` as
+float32 blobs so the summary table stays small.
+"""
+import json
+import sqlite3
+import time
+
+SUMMARY_FIELDS = [
+    "circ_mean", "circ_std", "linear_mean",
+    "freq_offset_ch0", "freq_offset_ch1",
+    "avg_ampl_ch0", "avg_ampl_ch1",
+    "max_i_ch0", "max_i_ch1",
+    "max_q_ch0", "max_q_ch1",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL,
+    meas_id INTEGER NOT NULL,
+    tile TEXT NOT NULL,
+    kind TEXT,
+    round INTEGER,
+    timestamp TEXT,
+    file TEXT,
+    received_utc REAL,
+    {summary_columns}
+);
+CREATE INDEX IF NOT EXISTS idx_captures_tile ON captures (tile, experiment, meas_id);
+CREATE INDEX IF NOT EXISTS idx_captures_meas ON captures (experiment, meas_id);
+CREATE TABLE IF NOT EXISTS traces (
+    capture_id INTEGER PRIMARY KEY REFERENCES captures (id),
+    decimation INTEGER,
+    phase BLOB
+);
+""".format(summary_columns=",\n    ".join(f"{name} REAL" for name in SUMMARY_FIELDS))
+
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def insert_message(self, frames, experiment, meas_id):
+        """
+        Store one multipart message as sent by client/result_push.py.
+        `experiment` and `meas_id` are the server's current values and are only
+        used when the tile did not encode them in the file name.
+        Returns the new capture id.
+        """
+        header = json.loads(frames[0].decode("utf-8"))
+        if header.get("type") != "capture":
+            raise ValueError(f"unknown message type: {header.get('type')}")
+        summary = header["summary"]
+        if header.get("meas_id", -1) >= 0:
+            meas_id = header["meas_id"]
+        experiment = header.get("experiment") or experiment
+
+        columns = ["experiment", "meas_id", "tile", "kind", "round", "timestamp", "file", "received_utc"]
+        values = [experiment, int(meas_id), header["tile"], header.get("kind"), header.get("round"),
+                  header.get("timestamp"), header.get("file"), time.time()]
+        columns += SUMMARY_FIELDS
+        values += [summary.get(name) for name in SUMMARY_FIELDS]
+
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO captures ({}) VALUES ({})".format(", ".join(columns), ", ".join("?" * len(columns))),
+                values,
+            )
+            capture_id = cur.lastrowid
+            trace = header.get("trace")
+            if trace and len(frames) > 1:
+                self.conn.execute(
+                    "INSERT INTO traces (capture_id, decimation, phase) VALUES (?, ?, ?)",
+                    (capture_id, trace["decimation"], frames[1]),
+                )
+        return capture_id
+
+    def close(self):
+        self.conn.close()
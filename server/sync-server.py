@@ -10,6 +10,8 @@ from datetime import datetime, timezone
 
 import csv
 
+from results_store import ResultsStore
+
 
 if len(sys.argv) > 1:
     delay = int(sys.argv[1])
@@ -36,7 +38,7 @@ alive_socket = context.socket(zmq.REP)
 alive_socket.bind("tcp://{}:{}".format(host, alive_port))
 
 
-# Create a SUB socket to listen for subscribers
+# REP socket on which the tiles push their capture summaries
 data_socket = context.socket(zmq.REP)
 data_socket.bind("tcp://{}:{}".format(host, data_port))
 
@@ -49,6 +51,10 @@ script_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)))
 
 poller = zmq.Poller()
 poller.register(alive_socket, zmq.POLLIN)
+poller.register(data_socket, zmq.POLLIN)
+
+data_poller = zmq.Poller()
+data_poller.register(data_socket, zmq.POLLIN)
 
 new_msg_received = 0
 WAIT_TIMEOUT = 60.0*10.0
@@ -58,6 +64,30 @@ print(f"Starting experiment: {unique_id}")
 data_dir = os.path.join(script_dir, "..", "data")
 os.makedirs(data_dir, exist_ok=True)
 output_path = os.path.join(data_dir, f"exp-{unique_id}.yml")
+results_store = ResultsStore(os.path.join(data_dir, f"results-{unique_id}.db"))
+
+
+def handle_data_message():
+    # every request on the REP socket must get exactly one reply
+    frames = data_socket.recv_multipart()
+    try:
+        results_store.insert_message(frames, unique_id, meas_id)
+        data_socket.send_string("OK")
+    except Exception as e:
+        print(f"Failed to store pushed result: {e}")
+        data_socket.send_string(f"ERR {e}")
+
+
+def serve_data_for(seconds):
+    # keep accepting pushed results instead of sleeping blindly
+    deadline = time.time() + seconds
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        if data_poller.poll(remaining * 1000):
+            handle_data_message()
+
 
 with open(output_path, "w") as f:
     f.write(f"experiment: {unique_id}\n")
@@ -76,6 +106,9 @@ with open(output_path, "w") as f:
             if messages_received > 2 and time.time() - new_msg_received > WAIT_TIMEOUT:
                 break
 
+            if data_socket in socks and socks[data_socket] == zmq.POLLIN:
+                handle_data_message()
+
             if alive_socket in socks and socks[alive_socket] == zmq.POLLIN:
                 new_msg_received = time.time()
                 message = alive_socket.recv_string()
@@ -90,7 +123,7 @@ with open(output_path, "w") as f:
 
         print(f"sending 'SYNC' message in {delay}s...")
         f.flush()
-        time.sleep(delay)
+        serve_data_for(delay)
 
         meas_id = meas_id + 1
         sync_socket.send_string(f"{meas_id} {unique_id}")  # str(meas_id)